@@ -0,0 +1,80 @@
+'''
+Measures how much the async pipeline overlaps reads, inference and writes on slow storage.
+Slow network storage is simulated locally by adding latency to every read and write.
+With --simulate-inference-ms the models are replaced by a fixed delay, so the overlap can be
+measured on machines without the model weights.
+
+Run from the repository root:
+    python benchmarks/bench_async_pipeline.py FOLDER [--read-latency-ms 80] [--write-latency-ms 40]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from src.pipeline import async_pipeline
+from src.pipeline.report_generator import generate_reports
+
+SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of test images")
+    parser.add_argument("--read-latency-ms", type=float, default=80)
+    parser.add_argument("--write-latency-ms", type=float, default=40)
+    parser.add_argument("--simulate-inference-ms", type=float, default=None,
+                        help="Replace the models with a fixed delay per image")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    images = [os.path.join(args.folder, f) for f in sorted(os.listdir(args.folder))
+              if f.lower().endswith(SUPPORTED_EXT)]
+    if not images:
+        print(f"Error: No image files found in {args.folder}")
+        return
+    jobs = [{"image_path": image, "car_year": "2020", "state": None, "include_shopping": False}
+            for image in images]
+
+    if args.simulate_inference_ms is not None:
+        def infer_func(batch, batch_size, **options):
+            time.sleep(args.simulate_inference_ms / 1000 * len(batch))
+            return [{"image": job["image_path"]} for job in batch]
+    else:
+        infer_func = generate_reports
+        generate_reports(jobs[:1], batch_size=1)  # load the models before timing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def write_func(job, report):
+            with open(Path(tmp) / (Path(job["image_path"]).stem + ".json"), "w") as f:
+                json.dump(report, f)
+
+        common = {"batch_size": args.batch_size, "infer_func": infer_func, "write_func": write_func,
+                  "read_latency": args.read_latency_ms / 1000, "write_latency": args.write_latency_ms / 1000}
+        _, sequential = async_pipeline.run_sequential(jobs, **common)
+        _, pipelined = async_pipeline.run_pipeline(jobs, readers=args.readers, **common)
+
+    print(f"{len(jobs)} image(s) | read latency {args.read_latency_ms}ms | "
+          f"write latency {args.write_latency_ms}ms\n")
+    print(f"{'mode':<12}{'wall (s)':>10}{'images/sec':>12}")
+    print("-" * 34)
+    for name, stats in [("sequential", sequential), ("pipelined", pipelined)]:
+        print(f"{name:<12}{stats['wall_seconds']:>10.2f}{len(jobs) / stats['wall_seconds']:>12.2f}")
+
+    print(f"\nStage busy wall time: read {pipelined['read_seconds']}s, infer {pipelined['infer_seconds']}s, "
+          f"write {pipelined['write_seconds']}s")
+    print(f"Overlap: {pipelined['overlap']}x | "
+          f"Speedup: {sequential['wall_seconds'] / pipelined['wall_seconds']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
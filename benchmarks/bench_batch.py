@@ -0,0 +1,54 @@
+'''
+Compares claim throughput of manifest batch mode against running main.py once per claim.
+Both modes run as fresh processes, so model loading and imports are included, like a nightly job.
+
+Run from the repository root:
+    python benchmarks/bench_batch.py MANIFEST [--batch-size 8]
+'''
+
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.pipeline.batch import load_manifest
+
+
+def run_main(args, stdin=None):
+    """Run main.py with arguments and return the wall time in seconds"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(ROOT / "main.py"), *args], input=stdin, text=True,
+                   cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="CSV or JSON claim manifest")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    claims = load_manifest(args.manifest)
+
+    # One cold process per claim, answering the interactive prompts on stdin
+    loop_seconds = 0
+    for claim in claims:
+        answers = f"{claim['car_year']}\n{claim['state'] or ''}\n{'y' if claim['include_shopping'] else 'n'}\n"
+        loop_seconds += run_main([claim["folder"]], stdin=answers)
+
+    batch_seconds = run_main(["--manifest", args.manifest, "--batch-size", str(args.batch_size)])
+
+    print(f"{len(claims)} claim(s)\n")
+    print(f"{'mode':<20}{'seconds':>10}{'claims/hour':>14}")
+    print("-" * 44)
+    for name, seconds in [("main.py per claim", loop_seconds), ("manifest batch", batch_seconds)]:
+        print(f"{name:<20}{seconds:>10.1f}{len(claims) / seconds * 3600:>14.1f}")
+    print(f"\nSpeedup: {loop_seconds / batch_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+'''
+Measures the Monte Carlo cost simulation on synthetic claims.
+Builds claims with random parts, states and severity/damage type probabilities (no models needed),
+then times one bulk simulate_claims() call and prints how the intervals compare to the point estimates.
+
+Run from the repository root:
+    python benchmarks/bench_cost_simulation.py [--claims 5000] [--damages 3] [--samples 500]
+'''
+
+import os
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from src.pipeline.estimate_cost import estimate_repair_cost, LABOR_RATES
+from src.pipeline.detect_damage import SEVERITY_LABELS, PART_LABELS
+from src.pipeline.cost_simulation import simulate_claims, DEFAULT_SAMPLES
+
+DAMAGE_TYPES = ["dent", "scratch", "crack", "glass shatter", "lamp broken", "tire flat"]
+
+
+def random_distribution(rng, labels):
+    weights = [rng.random() ** 3 for _ in labels]
+    total = sum(weights)
+    return {label: w / total for label, w in zip(labels, weights)}
+
+
+def make_claims(count, damages, seed):
+    """Build synthetic claims shaped like aggregated reports"""
+    rng = random.Random(seed)
+    states = [state for state in LABOR_RATES if state != "National_Average"] + [None]
+    claims = []
+
+    for _ in range(count):
+        state = rng.choice(states)
+        parts = []
+        for _ in range(rng.randint(1, damages * 2 - 1)):
+            severity = random_distribution(rng, SEVERITY_LABELS)
+            damage_type = random_distribution(rng, DAMAGE_TYPES)
+            part = rng.choice(PART_LABELS)
+            top_severity = max(severity, key=severity.get)
+            top_type = max(damage_type, key=damage_type.get)
+
+            damaged_part = {"part": part, "severity": top_severity, "type_of_damage": top_type,
+                            "probabilities": {"severity": severity, "type_of_damage": damage_type}}
+            damaged_part.update(estimate_repair_cost(part, top_severity, top_type, state))
+            parts.append(damaged_part)
+        claims.append({"damaged_parts": parts, "state": state})
+
+    return claims
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=5000)
+    parser.add_argument("--damages", type=int, default=3, help="Average damaged parts per claim")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    claims = make_claims(args.claims, args.damages, args.seed)
+    damages = sum(len(claim["damaged_parts"]) for claim in claims)
+
+    # Warm up the NumPy imports and cost table lookups
+    simulate_claims(claims[:10], samples=args.samples, seed=args.seed)
+
+    start = time.perf_counter()
+    _, intervals = simulate_claims(claims, samples=args.samples, seed=args.seed)
+    elapsed = time.perf_counter() - start
+
+    point = [sum(p["estimated_cost"] for p in claim["damaged_parts"]) for claim in claims]
+    inside = sum(i["p10"] <= cost <= i["p90"] for i, cost in zip(intervals, point))
+    width = sum((i["p90"] - i["p10"]) / i["p50"] for i in intervals if i["p50"]) / len(intervals)
+
+    print(f"{args.claims} claim(s), {damages} damage(s), {args.samples} samples per damage\n")
+    print(f"Simulation time:            {elapsed:.3f}s ({damages * args.samples / elapsed / 1e6:.1f}M draws/sec)")
+    print(f"Point estimate in P10-P90:  {inside / len(claims):.1%} of claims")
+    print(f"Mean P10-P90 width:         {width:.1%} of the median")
+
+
+if __name__ == "__main__":
+    main()
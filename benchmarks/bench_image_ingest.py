@@ -0,0 +1,88 @@
+'''
+Benchmarks image ingestion against decoding the full-resolution file.
+Each mode runs in its own subprocess so peak memory (max RSS) is measured separately.
+
+    full    - decode the whole photo, then resize it (what the models did before)
+    ingest  - reduced-size JPEG decoding with EXIF orientation and a resolution cap
+    cached  - read the normalized thumbnail cache (run after ingest has filled it)
+
+Run from the repository root:
+    python benchmarks/bench_image_ingest.py FOLDER [--max-side 1280]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def run_mode(mode, images, max_side):
+    """Decode every image with one mode and return timing and memory numbers"""
+    from PIL import Image
+    from src.pipeline.image_ingest import load_image, prepare_image
+
+    start = time.perf_counter()
+    for image_path in images:
+        if mode == "full":
+            with Image.open(image_path) as img:
+                img = img.convert("RGB")
+                img.thumbnail((max_side, max_side))
+        elif mode == "ingest":
+            load_image(image_path, max_side)
+        else:
+            prepare_image(image_path, max_side, cache=True)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        "mode": mode,
+        "ms_per_image": elapsed / len(images) * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of (large) test images")
+    parser.add_argument("--max-side", type=int, default=1280)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    images = [os.path.join(args.folder, f) for f in sorted(os.listdir(args.folder))
+              if f.lower().endswith(SUPPORTED_EXT)]
+    if not images:
+        print(f"Error: No image files found in {args.folder}")
+        return
+
+    # Child process: run a single mode and print the result as JSON
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, images, args.max_side)))
+        return
+
+    print(f"{len(images)} image(s), max side {args.max_side}px\n")
+    print(f"{'mode':<10}{'ms/image':>12}{'peak RSS (MB)':>16}")
+    print("-" * 38)
+
+    # Prime the cache first so the "cached" mode only measures reads
+    subprocess.run([sys.executable, __file__, args.folder, "--max-side", str(args.max_side),
+                    "--mode", "cached"], capture_output=True, check=True)
+
+    for mode in ["full", "ingest", "cached"]:
+        result = subprocess.run([sys.executable, __file__, args.folder,
+                                 "--max-side", str(args.max_side), "--mode", mode],
+                                capture_output=True, text=True, check=True)
+        stats = json.loads(result.stdout)
+        print(f"{mode:<10}{stats['ms_per_image']:>12.1f}{stats['peak_rss_mb']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
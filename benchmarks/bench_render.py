@@ -0,0 +1,247 @@
+'''
+Measures shopping guide and console summary rendering on one large synthetic claim.
+The previous line-by-line renderers (a list of lines joined into one string for the guide, one print()
+per line for the summary) are kept here as the baseline. For every guide format the compiled templates
+render into one string that is then written (buffered) and stream straight into the file (streamed);
+the console summary is rendered to a null device. Prints ms per render and peak Python memory of
+each mode, and checks that the text output is identical to the baseline.
+
+Run from the repository root:
+    python benchmarks/bench_render.py [--parts 500] [--repeat 5]
+'''
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from src.pipeline.parts_shopping import create_shopping_guide, format_shopping_report
+from src.pipeline.estimate_cost import estimate_repair_cost
+from src.pipeline.detect_damage import PART_LABELS, SEVERITY_LABELS
+from src.pipeline.render import render_shopping_guide, render_summary, GUIDE_FORMATS
+
+VEHICLE = {"year": "2020", "make": "Honda", "model": "Accord"}
+
+
+def make_claim(parts):
+    """Build an aggregated report and shopping guides with the given number of damaged parts"""
+    damaged_parts, guides = [], []
+    for i in range(parts):
+        part, severity = PART_LABELS[i % len(PART_LABELS)], SEVERITY_LABELS[i % len(SEVERITY_LABELS)]
+        cost = estimate_repair_cost(part, severity, "dent")
+        damaged_parts.append(dict(cost, part=part, type_of_damage="dent", severity=severity))
+        guides.append(create_shopping_guide(part, cost["part_cost"], cost["labor_cost"],
+                                            VEHICLE["year"], VEHICLE["make"], VEHICLE["model"]))
+
+    summary = {
+        "total_damages": parts,
+        "total_part_cost": sum(p["part_cost"] for p in damaged_parts),
+        "total_labor_hours": sum(p["labor_hours"] for p in damaged_parts),
+        "total_labor_cost": sum(p["labor_cost"] for p in damaged_parts),
+        "total_estimated_cost": sum(p["estimated_cost"] for p in damaged_parts)
+    }
+    return {"vehicle": VEHICLE, "damaged_parts": damaged_parts, "summary": summary}, guides
+
+
+def line_by_line_guide(shopping_guides, vehicle_info, total_estimates):
+    """The text guide as built before the template renderer: a list of lines joined at the end"""
+    lines = []
+    lines.append("=" * 80)
+    lines.append(" " * 25 + "AUTO PARTS SHOPPING GUIDE")
+    lines.append("=" * 80)
+    lines.append("")
+    lines.append(f"Vehicle: {vehicle_info['year']} {vehicle_info['make']} {vehicle_info['model']}")
+    lines.append("")
+    lines.append("COST SUMMARY")
+    lines.append("-" * 80)
+    lines.append(f"Total Parts Cost:  ${total_estimates['total_part_cost']:.2f}")
+    lines.append(f"Total Labor Cost:  ${total_estimates['total_labor_cost']:.2f}")
+    lines.append(f"TOTAL ESTIMATE:    ${total_estimates['total_estimated_cost']:.2f}")
+    lines.append("")
+
+    for i, guide in enumerate(shopping_guides, 1):
+        lines.append("=" * 80)
+        lines.append(f"PART {i}: {guide['part']}")
+        lines.append("=" * 80)
+        lines.append("")
+        lines.append(f"Estimated Cost: ${guide['cost_breakdown']['estimated_part_cost']:.2f} "
+                     f"(Labor: ${guide['cost_breakdown']['estimated_labor_cost']:.2f})")
+        lines.append("")
+        lines.append("SHOPPING OPTIONS:")
+        lines.append("-" * 80)
+        lines.append("")
+
+        for j, option in enumerate(guide['shopping_options'], 1):
+            lines.append(f"{j}. {option['type']}")
+            lines.append(f"   Quality Level: {option['quality']}")
+            price_range = option['price_range']
+            lines.append(f"   Price Range: ${price_range['min']:.2f} - ${price_range['max']:.2f}")
+            lines.append(f"   Estimated: ${price_range['estimated']:.2f}")
+            lines.append(f"   Warranty: {option['warranty']}")
+            lines.append(f"   Source: {option['source']}")
+            lines.append(f"   ")
+            lines.append(f"   Pros: {', '.join(option['pros'])}")
+            lines.append(f"   Cons: {', '.join(option['cons'])}")
+            lines.append(f"   ")
+            lines.append(f"   Best For: {option['best_for']}")
+            lines.append("")
+
+        lines.append("WHERE TO SHOP ONLINE:")
+        lines.append("-" * 80)
+        lines.append("")
+
+        for retailer in guide['where_to_buy']:
+            lines.append(f" {retailer['name']}")
+            lines.append(f"   {retailer['url']}")
+            lines.append(f"   Search for: {', '.join(retailer['search_terms'])}")
+            lines.append(f"   Quality tiers: {', '.join(retailer['quality_tiers'])}")
+            lines.append("")
+
+        lines.append("")
+
+    lines.append("=" * 80)
+    lines.append("SHOPPING TIPS")
+    lines.append("=" * 80)
+    lines.append("")
+    for tip in shopping_guides[0]['tips']:
+        lines.append(f"- {tip}")
+    lines.append("")
+
+    lines.append("=" * 80)
+    lines.append("IMPORTANT NOTES")
+    lines.append("=" * 80)
+    lines.append("")
+    lines.append(" PAINTING: Most body parts require professional painting after installation.")
+    lines.append("   Paint costs typically range from $200-$500 per panel depending on:")
+    lines.append("   - Single stage vs. multi-stage paint")
+    lines.append("   - Color matching complexity")
+    lines.append("   - Clear coat and finish quality")
+    lines.append("")
+    lines.append(" INSTALLATION: Labor costs vary by shop and location.")
+    lines.append("   Consider getting quotes from multiple repair shops.")
+    lines.append("")
+    lines.append(" INSURANCE: If filing a claim, check with your insurance about:")
+    lines.append("   - Approved repair shops")
+    lines.append("   - OEM vs aftermarket parts requirements")
+    lines.append("   - Your deductible and coverage limits")
+    lines.append("")
+    lines.append("=" * 80)
+
+    return "\n".join(lines)
+
+
+def line_by_line_summary(report):
+    """The console summary as printed before the template renderer: one print() per line"""
+    summary = report['summary']
+    print("DAMAGE ASSESSMENT SUMMARY")
+    print("-" * 70)
+    print(f"Vehicle: {report['vehicle']['year']} {report['vehicle']['make']} {report['vehicle']['model']}")
+    print(f"\nTotal Damages Found: {summary['total_damages']}")
+    if summary.get('damages_needing_review'):
+        print(f"Needing Review:      {summary['damages_needing_review']}")
+    print(f"Total Part Cost:     ${summary['total_part_cost']:.2f}")
+    print(f"Total Labor Hours:   {summary['total_labor_hours']:.2f} hrs")
+    print(f"Total Labor Cost:    ${summary['total_labor_cost']:.2f}")
+    print(f"\nTOTAL ESTIMATE:      ${summary['total_estimated_cost']:.2f}")
+    if "cost_interval" in summary:
+        cost_interval = summary['cost_interval']
+        print(f"Likely Range:        ${cost_interval['p10']:.2f} - ${cost_interval['p90']:.2f} "
+              f"(median ${cost_interval['p50']:.2f})")
+    print("-" * 70)
+
+    print("\nDAMAGES DETECTED:")
+    for i, part in enumerate(report['damaged_parts'], 1):
+        print(f"\n{i}. {part['part']}")
+        print(f"   Type: {part['type_of_damage']} | Severity: {part['severity']}")
+        if "confidence" in part:
+            confidence = part["confidence"]
+            print(f"   Confidence: part {confidence['part']:.2f} | type {confidence['type_of_damage']:.2f} | "
+                  f"severity {confidence['severity']:.2f}"
+                  f"{'  (NEEDS REVIEW)' if part.get('needs_review') else ''}")
+        print(f"   Cost: ${part['estimated_cost']:.2f} "
+              f"(Parts: ${part['part_cost']:.2f} + Labor: ${part['labor_cost']:.2f})")
+        if "cost_interval" in part:
+            print(f"   Likely range: ${part['cost_interval']['p10']:.2f} - ${part['cost_interval']['p90']:.2f}")
+
+
+def measure(func, repeat):
+    """Return (ms per call, peak traced memory in KB)"""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    ms = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ms, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report, guides = make_claim(args.parts)
+    path = os.path.join(tempfile.mkdtemp(), "guide")
+
+    def line_by_line(fmt):
+        text = line_by_line_guide(guides, VEHICLE, report["summary"])
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def buffered(fmt):
+        text = format_shopping_report(guides, VEHICLE, report["summary"], fmt)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def streamed(fmt):
+        with open(path, "w", encoding="utf-8") as f:
+            render_shopping_guide(f, guides, VEHICLE, report["summary"], fmt)
+
+    print(f"Claim with {args.parts} damaged parts\n")
+    print(f"{'output':<20}{'mode':<10}{'ms':>10}{'peak KB':>12}")
+    print("-" * 52)
+
+    for fmt in GUIDE_FORMATS:
+        # Only the text guide existed before the template renderer
+        modes = (("baseline", line_by_line),) if fmt == "text" else ()
+        for mode, func in modes + (("buffered", buffered), ("streamed", streamed)):
+            ms, peak = measure(lambda: func(fmt), args.repeat)
+            print(f"{'guide ' + fmt:<20}{mode:<10}{ms:>10.1f}{peak:>12.0f}")
+
+    with open(os.devnull, "w") as devnull:
+        def printed():
+            with contextlib.redirect_stdout(devnull):
+                line_by_line_summary(report)
+
+        for mode, func in (("baseline", printed), ("streamed", lambda: render_summary(report, devnull))):
+            ms, peak = measure(func, args.repeat)
+            print(f"{'console summary':<20}{mode:<10}{ms:>10.1f}{peak:>12.0f}")
+
+    # The renderer must produce exactly what the line-by-line code did
+    summary = StringIO()
+    with contextlib.redirect_stdout(summary):
+        line_by_line_summary(report)
+    rendered = StringIO()
+    render_summary(report, rendered)
+    same_guide = line_by_line_guide(guides, VEHICLE, report["summary"]) == \
+        format_shopping_report(guides, VEHICLE, report["summary"], "text")
+    print(f"\nText output identical to baseline: guide {'yes' if same_guide else 'NO'}, "
+          f"summary {'yes' if summary.getvalue() == rendered.getvalue() else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+'''
+Benchmarks the report output formats against the original indented JSON.
+Builds a synthetic aggregated report and compares write time and file size for each writer.
+
+Run from the repository root:
+    python benchmarks/bench_report_writers.py [--parts 500] [--repeat 20]
+'''
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # cost tables are loaded relative to the repository root
+
+from src.pipeline.estimate_cost import estimate_repair_cost, PART_COST_TABLE
+from src.pipeline.report_writers import REPORT_WRITERS
+
+
+def build_report(num_parts, seed=0):
+    """Build an aggregated report with num_parts random damaged parts"""
+    rng = random.Random(seed)
+    parts = [p for p in PART_COST_TABLE if p != "Default"]
+    damaged_parts = []
+
+    for _ in range(num_parts):
+        part = rng.choice(parts)
+        severity = rng.choice(["Minor", "Moderate", "Severe"])
+        damage_type = rng.choice(["dent", "scratch", "damage"])
+        cost = estimate_repair_cost(part, severity, damage_type, state="Ohio")
+        damaged_parts.append({"part": part, "type_of_damage": damage_type,
+                              "severity": severity, **cost})
+
+    return {
+        "vehicle": {"make": "HONDA", "model": "ACCORD", "year": "2020"},
+        "timestamp": "2024-11-15T12:00:00",
+        "damaged_parts": damaged_parts,
+        "summary": {
+            "total_damages": len(damaged_parts),
+            "total_estimated_cost": round(sum(p["estimated_cost"] for p in damaged_parts), 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=500, help="Damaged parts in the report")
+    parser.add_argument("--repeat", type=int, default=20, help="Writes per format")
+    args = parser.parse_args()
+
+    report = build_report(args.parts)
+    print(f"Report with {args.parts} damaged parts, {args.repeat} writes per format\n")
+    print(f"{'format':<10}{'ms/write':>12}{'size (KB)':>12}{'vs json':>10}")
+    print("-" * 44)
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, (extension, writer, _) in REPORT_WRITERS.items():
+            output_path = Path(tmp) / f"report{extension}"
+            try:
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    writer(report, output_path)
+                elapsed = (time.perf_counter() - start) / args.repeat * 1000
+            except ImportError as e:
+                print(f"{fmt:<10}skipped ({e})")
+                continue
+
+            size = output_path.stat().st_size / 1024
+            if baseline is None:
+                baseline = elapsed
+            print(f"{fmt:<10}{elapsed:>12.3f}{size:>12.1f}{baseline / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
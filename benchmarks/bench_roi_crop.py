@@ -0,0 +1,76 @@
+'''
+Compares full-frame damage classification with region-of-interest crops from the part detector.
+Runs the whole pipeline on a folder of images once per mode (full frame, --roi best, --roi all)
+and reports ms/image, damaged parts found and how often the damage type and severity of the
+main damaged part agree with the full-frame run.
+
+Run from the repository root:
+    python benchmarks/bench_roi_crop.py FOLDER [--batch-size 8] [--max-images 64]
+'''
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from src.pipeline.report_generator import generate_reports
+from src.pipeline.image_ingest import prepare_image, DEFAULT_MAX_SIDE
+from src.pipeline.roi import ROI_MODES
+
+SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def run_mode(jobs, roi_mode, batch_size):
+    """Return (reports, ms/image) for one ROI mode"""
+    start = time.perf_counter()
+    reports = generate_reports(jobs, batch_size=batch_size, roi_mode=roi_mode)
+    return reports, (time.perf_counter() - start) / len(jobs) * 1000
+
+
+def agreement(reports, baseline, field):
+    same = sum(r["damaged_part"][field] == b["damaged_part"][field] for r, b in zip(reports, baseline))
+    return same / len(baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of damage photos")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-images", type=int, default=64)
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.folder, f) for f in sorted(os.listdir(args.folder))
+             if f.lower().endswith(SUPPORTED_EXT)][:args.max_images]
+    if not paths:
+        print(f"Error: No images found in {args.folder}")
+        return
+
+    # Decode once so every mode times inference and cropping only
+    jobs = [{"image_path": path, "image": prepare_image(path, DEFAULT_MAX_SIDE), "car_year": "2020",
+             "state": None, "include_shopping": False} for path in paths]
+
+    # Warm up so model loading is not timed
+    generate_reports(jobs[:1], batch_size=1)
+
+    baseline, baseline_ms = run_mode(jobs, None, args.batch_size)
+
+    print(f"{len(jobs)} image(s) | batch size {args.batch_size}\n")
+    print(f"{'mode':<8}{'ms/image':>10}{'parts':>8}{'type agree':>12}{'severity agree':>16}")
+    print("-" * 54)
+    print(f"{'full':<8}{baseline_ms:>10.1f}{len(baseline):>8}{1.0:>12.3f}{1.0:>16.3f}")
+
+    for mode in ROI_MODES:
+        reports, ms = run_mode(jobs, mode, args.batch_size)
+        parts = sum(1 + len(r.get("additional_damage", [])) for r in reports)
+        print(f"{mode:<8}{ms:>10.1f}{parts:>8}"
+              f"{agreement(reports, baseline, 'type_of_damage'):>12.3f}"
+              f"{agreement(reports, baseline, 'severity'):>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
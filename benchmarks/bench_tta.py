@@ -0,0 +1,118 @@
+'''
+Measures what adaptive test-time augmentation buys on a labeled sample folder.
+The folder holds one sub-folder per true label, e.g. FOLDER/dent/*.jpg, FOLDER/scratch/*.jpg.
+Reports accuracy and ms/image with and without TTA, and the accuracy gain per added millisecond.
+With --fit-temperature the stage's calibration temperature is fitted and saved first, on a held-out
+set: --calibration-folder if given, otherwise every other image of each label, and accuracy is then
+measured on the remaining images only.
+
+Run from the repository root:
+    python benchmarks/bench_tta.py FOLDER --stage type_of_damage [--threshold 0.6] [--fit-temperature]
+        [--calibration-folder HELD_OUT_FOLDER]
+'''
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from src.pipeline.report_generator import STAGE_PREDICTORS
+from src.pipeline.evaluation import normalize, load_labeled_folder, accuracy
+from src.pipeline.image_ingest import prepare_image, DEFAULT_MAX_SIDE
+from src.pipeline.confidence import (finalize_prediction, apply_tta, new_budget, fit_temperature,
+                                     save_calibration, DEFAULT_TTA_THRESHOLD)
+
+
+def split_held_out(paths, labels):
+    """Split a labeled folder into (fit paths, fit labels, eval paths, eval labels), alternating within each label"""
+    fit, evaluate = ([], []), ([], [])
+    seen = {}
+    for path, label in zip(paths, labels):
+        target = fit if seen.get(label, 0) % 2 == 0 else evaluate
+        seen[label] = seen.get(label, 0) + 1
+        target[0].append(path)
+        target[1].append(label)
+    return fit[0], fit[1], evaluate[0], evaluate[1]
+
+
+def fit_stage_temperature(predict, stage, paths, labels, batch_size):
+    """Fit and save the stage's temperature on labeled images, returning it"""
+    images = [prepare_image(path, DEFAULT_MAX_SIDE) for path in paths]
+    predictions = predict(images, batch_size)
+    matched = {normalize(l): l for p in predictions for l in p["scores"]}
+    true_labels = [matched.get(normalize(label), label) for label in labels]
+    temperature = fit_temperature([p["scores"] for p in predictions], true_labels, stage)
+    save_calibration({stage: temperature})
+    return temperature
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Labeled folder with one sub-folder per label")
+    parser.add_argument("--stage", choices=list(STAGE_PREDICTORS), default="type_of_damage")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_TTA_THRESHOLD)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--fit-temperature", action="store_true",
+                        help="Fit and save the calibration temperature of the stage on held-out images")
+    parser.add_argument("--calibration-folder",
+                        help="Labeled folder to fit the temperature on (default: every other image of FOLDER)")
+    args = parser.parse_args()
+
+    paths, labels = load_labeled_folder(args.folder)
+    if not paths:
+        print(f"Error: No labeled images found in {args.folder}")
+        return
+
+    predict = STAGE_PREDICTORS[args.stage]
+
+    # The temperature is fitted on images that accuracy is not measured on
+    if args.fit_temperature:
+        if args.calibration_folder:
+            fit_paths, fit_labels = load_labeled_folder(args.calibration_folder)
+        else:
+            fit_paths, fit_labels, paths, labels = split_held_out(paths, labels)
+        if not fit_paths or not paths:
+            print("Error: Need labeled images both to fit the temperature and to measure accuracy")
+            return
+        temperature = fit_stage_temperature(predict, args.stage, fit_paths, fit_labels, args.batch_size)
+        print(f"Fitted temperature for {args.stage} on {len(fit_paths)} held-out image(s): "
+              f"{temperature:.2f} (saved)\n")
+
+    images = [prepare_image(path, DEFAULT_MAX_SIDE) for path in paths]
+
+    # Warm up so model loading is not timed
+    predict(images[:1], 1)
+
+    start = time.perf_counter()
+    base = [finalize_prediction(p, args.stage) for p in predict(images, args.batch_size)]
+    base_ms = (time.perf_counter() - start) / len(images) * 1000
+    base_acc = accuracy(base, labels)
+
+    # TTA with an unlimited budget, so the threshold alone decides which images get extra views
+    budget = new_budget(len(images) * 10)
+    tta = [dict(p) for p in base]
+    start = time.perf_counter()
+    apply_tta(tta, images, predict, args.stage, [budget] * len(images), args.threshold, args.batch_size)
+    tta_ms = base_ms + (time.perf_counter() - start) / len(images) * 1000
+    tta_acc = accuracy(tta, labels)
+
+    print(f"Stage: {args.stage} | {len(images)} image(s) | threshold {args.threshold}\n")
+    print(f"{'mode':<8}{'accuracy':>10}{'ms/image':>12}")
+    print("-" * 30)
+    print(f"{'base':<8}{base_acc:>10.3f}{base_ms:>12.1f}")
+    print(f"{'tta':<8}{tta_acc:>10.3f}{tta_ms:>12.1f}")
+    print(f"\nExtra forward passes: {budget['used']} "
+          f"({sum(p['confidence'] < args.threshold for p in base)} low-confidence image(s))")
+
+    added_ms = tta_ms - base_ms
+    if added_ms > 0:
+        print(f"Accuracy gain per added ms/image: {(tta_acc - base_acc) / added_ms * 100:.3f} points")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+'''
+Measures time-to-first-report with and without the warm pool daemon.
+Both cases run `python main.py FOLDER` as a fresh client process on a folder holding only IMAGE,
+answering the prompts on stdin, so interpreter start, imports and report writing count on both sides.
+Cold: main.py imports torch, loads the models and generates the report itself. Warm: the daemon is
+started once (its startup is timed too) and `main.py FOLDER --daemon` sends the image to it.
+
+Run from the repository root:
+    python benchmarks/bench_warm_pool.py IMAGE [--workers 2] [--repeat 5]
+'''
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from src.pipeline import warm_pool
+
+# Vehicle year, national average labor rate, no shopping guide
+ANSWERS = "2020\n\nn\n"
+
+
+def time_main(folder, *args, env=None):
+    """Run main.py on a folder as a fresh process and return the wall time in seconds"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(ROOT / "main.py"), folder, "--quiet", *args], input=ANSWERS,
+                   text=True, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def start_daemon(workers, path):
+    """Start the daemon and return (process, seconds until it answers)"""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "src.pipeline.warm_pool", "start",
+                             "--workers", str(workers), "--socket", path], cwd=ROOT)
+    # The daemon listens before its workers warm up, a status reply means the first worker is ready
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("Warm pool daemon exited during startup")
+        try:
+            warm_pool.request({"command": "status"}, path, timeout=warm_pool.CONNECT_TIMEOUT)
+            break
+        except warm_pool.WarmPoolError:
+            time.sleep(0.05)
+    return proc, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image", help="Image to generate reports for")
+    parser.add_argument("--workers", type=int, default=warm_pool.DEFAULT_WORKERS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # A folder holding only the image, since main.py processes folders
+    folder = tempfile.mkdtemp()
+    shutil.copy(args.image, folder)
+
+    cold = [time_main(folder) for _ in range(args.repeat)]
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    proc, startup = start_daemon(args.workers, path)
+    try:
+        env = dict(os.environ)
+        env[warm_pool.SOCKET_ENV] = path
+        warm = [time_main(folder, "--daemon", env=env) for _ in range(args.repeat)]
+    finally:
+        warm_pool.request({"command": "shutdown"}, path)
+        proc.wait(timeout=30)
+
+    print(f"\n{'mode':<24}{'first (ms)':>12}{'median (ms)':>14}")
+    print("-" * 50)
+    print(f"{'main.py':<24}{cold[0] * 1000:>12.0f}{statistics.median(cold) * 1000:>14.0f}")
+    print(f"{'main.py --daemon':<24}{warm[0] * 1000:>12.0f}{statistics.median(warm) * 1000:>14.0f}")
+    print(f"\nDaemon startup (paid once): {startup:.1f}s with {args.workers} worker(s)")
+
+
+if __name__ == "__main__":
+    main()
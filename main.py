@@ -6,9 +6,22 @@ Includes shopping guide feature without requiring API keys.
 '''
 
 import os
-import sys
+import argparse
 from pathlib import Path
 import src.pipeline.report_generator as report_gen
+from src.pipeline.report_writers import REPORT_WRITERS, DEFAULT_FORMAT
+import src.pipeline.batch as batch
+import src.pipeline.async_pipeline as async_pipeline
+from src.pipeline.output_store import create_run_dir
+from src.pipeline.image_ingest import DEFAULT_MAX_SIDE
+import src.pipeline.checkpoint as checkpoint
+import src.pipeline.model_store as model_store
+import src.pipeline.runtime_profile as runtime_profile
+import src.pipeline.warm_pool as warm_pool
+from src.pipeline.confidence import new_budget, DEFAULT_TTA_BUDGET, DEFAULT_TTA_THRESHOLD
+from src.pipeline.roi import ROI_MODES
+from src.pipeline.cost_simulation import add_cost_intervals, DEFAULT_SAMPLES
+from src.pipeline.render import GUIDE_FORMATS, DEFAULT_GUIDE_FORMAT
 
 def print_banner():
     """Print a nice banner for the application"""
@@ -44,20 +57,246 @@ def get_user_input():
     
     return car_year, state, include_shopping
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Run the AutoClaimAI pipeline on a folder of images.")
+    parser.add_argument("input_path", nargs="?", default=None,
+                        help="Folder of images to process (default: ./input)")
+    parser.add_argument("--format", default=DEFAULT_FORMAT,
+                        help=f"Comma separated report formats: {', '.join(REPORT_WRITERS)} "
+                             f"(default: {DEFAULT_FORMAT})")
+    parser.add_argument("--guide-format", default=DEFAULT_GUIDE_FORMAT,
+                        help=f"Comma separated readable shopping guide formats: {', '.join(GUIDE_FORMATS)} "
+                             f"(default: {DEFAULT_GUIDE_FORMAT})")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Skip the damage summary and next steps on the console (reports are still saved)")
+    parser.add_argument("--max-side", type=int, default=DEFAULT_MAX_SIDE,
+                        help=f"Downscale images to at most this many pixels per side before inference "
+                             f"(default: {DEFAULT_MAX_SIDE}, 0 to use full resolution)")
+    parser.add_argument("--thumbnail-cache", action="store_true",
+                        help="Cache downscaled images in a .autoclaim_cache folder next to the input")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip images already finished by an earlier (interrupted) run of this folder")
+    parser.add_argument("--retries", type=int, default=1,
+                        help="Times to retry an image after it fails (default: 1)")
+    parser.add_argument("--stage-timeout", type=float, default=None,
+                        help="Seconds each model stage may take per image before it is retried "
+                             "(a retry first waits up to this long for the timed-out stage to finish)")
+    parser.add_argument("--tta", action="store_true",
+                        help="Run extra flipped/cropped views for low-confidence predictions")
+    parser.add_argument("--tta-budget", type=int, default=DEFAULT_TTA_BUDGET,
+                        help=f"Maximum extra forward passes per claim with --tta (default: {DEFAULT_TTA_BUDGET})")
+    parser.add_argument("--tta-threshold", type=float, default=DEFAULT_TTA_THRESHOLD,
+                        help=f"Confidence below which --tta runs extra views (default: {DEFAULT_TTA_THRESHOLD})")
+    parser.add_argument("--roi", choices=ROI_MODES, default=None,
+                        help="Run the damage type and severity models on crops of the detected part: "
+                             "'best' box only, or 'all' boxes as separate damaged parts (default: full frame)")
+    parser.add_argument("--cost-interval", action="store_true",
+                        help="Add P10/P50/P90 repair cost intervals from a Monte Carlo simulation over the "
+                             "severity and damage type probabilities, labor hours, rates and part tiers")
+    parser.add_argument("--cost-samples", type=int, default=DEFAULT_SAMPLES,
+                        help=f"Monte Carlo draws per damage with --cost-interval (default: {DEFAULT_SAMPLES})")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only load models from the local store in src/models/, never from the hub")
+    parser.add_argument("--verify-models", action="store_true",
+                        help="Check model sha256 digests against src/models/manifest.json at startup")
+    parser.add_argument("--profile", default=str(runtime_profile.PROFILE_PATH),
+                        help="Runtime profile with thread/allocator settings "
+                             "(default: runtime_profile.json, written by 'runtime_profile autotune')")
+    parser.add_argument("--worker-index", type=int, default=None,
+                        help="Index (0, 1, ...) of this run among the pipelines sharing the host, "
+                             "selects its CPUs when the profile pins workers")
+    parser.add_argument("--async-io", action="store_true",
+                        help="Overlap image reads, batched inference and journal writes "
+                             "(failed batches fall back to one image at a time instead of --retries)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Send the images to the warm pool daemon, which keeps the models loaded "
+                             "(start it with 'python -m src.pipeline.warm_pool start')")
+    parser.add_argument("--readers", type=int, default=4,
+                        help="Reader threads prefetching images with --async-io (default: 4)")
+    parser.add_argument("--manifest", default=None,
+                        help="CSV or JSON manifest of claims (folder, year, state, include_shopping) "
+                             "to process in one batch run instead of a single folder")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Images per inference batch with --manifest or --async-io (default: 8)")
+    args = parser.parse_args()
+
+    args.formats = [fmt.strip() for fmt in args.format.split(",") if fmt.strip()]
+    if not args.formats:
+        parser.error("--format needs at least one format")
+    for fmt in args.formats:
+        if fmt not in REPORT_WRITERS:
+            parser.error(f"unknown format '{fmt}' (choose from {', '.join(REPORT_WRITERS)})")
+    
+    args.guide_formats = [fmt.strip() for fmt in args.guide_format.split(",") if fmt.strip()]
+    if not args.guide_formats:
+        parser.error("--guide-format needs at least one format")
+    for fmt in args.guide_formats:
+        if fmt not in GUIDE_FORMATS:
+            parser.error(f"unknown guide format '{fmt}' (choose from {', '.join(GUIDE_FORMATS)})")
+    
+    if args.daemon and (args.manifest or args.async_io):
+        parser.error("--daemon cannot be combined with --manifest or --async-io")
+
+    return args
+
+def process_images(images, completed, journal, car_year, state, include_shopping, tta_budget, args):
+    """Generate reports one image at a time with retries, skipping images finished in the journal"""
+    reports = []
+    for i, img in enumerate(images, 1):
+        print(f"[{i}/{len(images)}] Processing: {os.path.basename(img)}")
+        
+        report = checkpoint.get_completed_report(completed, img)
+        if report is not None:
+            reports.append(report)
+            print(f"Skipped - already finished ({report['damaged_part']['part']})")
+            continue
+        
+        try:
+            report = checkpoint.run_with_retries(
+                lambda: report_gen.generate_report(img, car_year, state, include_shopping,
+                                                   max_side=args.max_side,
+                                                   thumbnail_cache=args.thumbnail_cache,
+                                                   stage_timeout=args.stage_timeout,
+                                                   tta_budget=tta_budget,
+                                                   tta_threshold=args.tta_threshold,
+                                                   roi_mode=args.roi),
+                retries=args.retries
+            )
+            checkpoint.record_success(journal, img, report)
+            reports.append(report)
+            print(f"Complete - {report['damaged_part']['part']} ({report['damaged_part']['severity']})")
+        except Exception as e:
+            checkpoint.record_failure(journal, img, e, attempts=args.retries + 1)
+            print(f"Error: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    return reports
+
+def process_images_async(images, completed, journal, car_year, state, include_shopping, tta_budget, args):
+    """Generate reports with image reads, batched inference and journal writes overlapping"""
+    reports = [checkpoint.get_completed_report(completed, img) for img in images]
+    pending = [i for i, report in enumerate(reports) if report is None]
+    print(f"{len(images) - len(pending)} image(s) already finished, {len(pending)} to process\n")
+    
+    jobs = [{
+        "image_path": images[i],
+        "car_year": car_year,
+        "state": state,
+        "include_shopping": include_shopping,
+        "tta_budget": tta_budget
+    } for i in pending]
+    
+    def write(job, report):
+        checkpoint.record_success(journal, job["image_path"], report)
+        print(f"Complete - {os.path.basename(job['image_path'])}: "
+              f"{report['damaged_part']['part']} ({report['damaged_part']['severity']})")
+    
+    def fail(job, error):
+        checkpoint.record_failure(journal, job["image_path"], error, attempts=1)
+        print(f"Error: {os.path.basename(job['image_path'])}: {error}")
+    
+    new_reports, stats = async_pipeline.run_pipeline(
+        jobs, batch_size=args.batch_size, readers=args.readers, max_side=args.max_side,
+        thumbnail_cache=args.thumbnail_cache, stage_timeout=args.stage_timeout,
+        tta_threshold=args.tta_threshold, write_func=write, fail_func=fail, roi_mode=args.roi
+    )
+    print(f"\nPipeline: {stats['wall_seconds']}s wall (read {stats['read_seconds']}s, "
+          f"inference {stats['infer_seconds']}s, write {stats['write_seconds']}s busy), "
+          f"stage overlap {stats['overlap']}x")
+    
+    for i, report in zip(pending, new_reports):
+        reports[i] = report
+    return [report for report in reports if report is not None]
+
+def process_images_daemon(images, completed, journal, car_year, state, include_shopping, tta_budget, args):
+    """Generate reports in the warm pool daemon, one batch per request, skipping images finished in the journal"""
+    reports = [checkpoint.get_completed_report(completed, img) for img in images]
+    pending = [i for i, report in enumerate(reports) if report is None]
+    print(f"{len(images) - len(pending)} image(s) already finished, {len(pending)} to process\n")
+    
+    options = {"max_side": args.max_side, "thumbnail_cache": args.thumbnail_cache,
+               "stage_timeout": args.stage_timeout, "tta_threshold": args.tta_threshold, "roi_mode": args.roi}
+    for offset in range(0, len(pending), args.batch_size):
+        batch_indices = pending[offset:offset + args.batch_size]
+        jobs = [{
+            "image_path": os.path.abspath(images[i]),
+            "car_year": car_year,
+            "state": state,
+            "include_shopping": include_shopping
+        } for i in batch_indices]
+        
+        # The claim's TTA budget is shared across requests
+        try:
+            new_reports, tta_used = warm_pool.submit(
+                jobs, batch_size=args.batch_size,
+                tta_budget=tta_budget["remaining"] if tta_budget is not None else None, **options
+            )
+        except warm_pool.WarmPoolError as e:
+            for i in batch_indices:
+                checkpoint.record_failure(journal, images[i], e, attempts=1)
+                print(f"Error: {os.path.basename(images[i])}: {e}")
+            continue
+        if tta_budget is not None:
+            tta_budget["remaining"] -= tta_used
+            tta_budget["used"] += tta_used
+        
+        for i, report in zip(batch_indices, new_reports):
+            if report is None:
+                checkpoint.record_failure(journal, images[i], "failed in warm pool worker", attempts=1)
+                print(f"Error: {os.path.basename(images[i])}: failed in warm pool worker")
+                continue
+            checkpoint.record_success(journal, images[i], report)
+            reports[i] = report
+            print(f"Complete - {os.path.basename(images[i])}: "
+                  f"{report['damaged_part']['part']} ({report['damaged_part']['severity']})")
+    
+    return [report for report in reports if report is not None]
+
 def main():    
+    args = parse_args()
     print_banner()
     
-    # Determine folder path based off of number of user arguments
-    if len(sys.argv) == 1:
+    if args.daemon:
+        # The daemon already loaded and checked the models, so this process never imports torch
+        if not warm_pool.is_running():
+            print(f"Error: No warm pool daemon on {warm_pool.socket_path()}")
+            print("Start it with 'python -m src.pipeline.warm_pool start'")
+            return
+    else:
+        # Apply thread and allocator settings before any model is loaded
+        applied = runtime_profile.apply_profile(runtime_profile.load_profile(args.profile),
+                                                worker_index=args.worker_index)
+        if applied:
+            print(f"Runtime profile: {', '.join(f'{k}={v}' for k, v in applied.items())}\n")
+    
+    if args.offline:
+        os.environ[model_store.OFFLINE_ENV] = "1"
+        os.environ["HF_HUB_OFFLINE"] = "1"
+    
+    # Fail fast on missing weights instead of on the first image
+    if not args.daemon and not model_store.check_startup(check_hash=args.verify_models):
+        return
+    
+    # Manifest mode: many claims in one process, models stay loaded between claims
+    if args.manifest:
+        batch.run_batch(args.manifest, batch_size=args.batch_size, formats=args.formats,
+                        max_side=args.max_side, thumbnail_cache=args.thumbnail_cache,
+                        stage_timeout=args.stage_timeout,
+                        tta_budget=args.tta_budget if args.tta else None,
+                        tta_threshold=args.tta_threshold, roi_mode=args.roi,
+                        cost_samples=args.cost_samples if args.cost_interval else None,
+                        guide_formats=args.guide_formats)
+        return
+    
+    # Determine folder path based off of user arguments
+    if args.input_path is None:
         input_path = Path(__file__).resolve().parent / "input"
         print(f"Using default input folder: {input_path}")
         print(f"Tip: Run 'python main.py /path/to/folder' to use a different folder\n")
-        
-    elif len(sys.argv) > 2:
-        print("Usage: python main.py [/path/to/image_folder]")
-        return
     else:
-        input_path = sys.argv[1]
+        input_path = args.input_path
 
     if not os.path.isdir(input_path):
         print(f"Error: Invalid folder path: {input_path}")
@@ -75,25 +314,42 @@ def main():
 
     print(f"Found {len(images)} image(s) to process\n")
     
-    # Get user input
-    car_year, state, include_shopping = get_user_input()
+    # Load the checkpoint journal of an earlier run of this folder
+    journal = checkpoint.journal_path(input_path)
+    settings, completed = checkpoint.load_journal(journal) if args.resume else (None, {})
+    
+    # Get user input (a resumed run reuses the answers from the journal)
+    if settings:
+        car_year, state, include_shopping = settings["car_year"], settings["state"], settings["include_shopping"]
+        print(f"Resuming run: {len(completed)} image(s) already finished")
+        print(f"Vehicle year: {car_year} | State: {state or 'National average'} | "
+              f"Shopping guide: {'yes' if include_shopping else 'no'}")
+    else:
+        car_year, state, include_shopping = get_user_input()
+        checkpoint.start_journal(journal, {
+            "car_year": car_year,
+            "state": state,
+            "include_shopping": include_shopping
+        })
     
     print(f"\n{'='*70}")
     print("PROCESSING IMAGES")
     print("="*70 + "\n")
 
-    # Generate reports for each image
-    reports = []
-    for i, img in enumerate(images, 1):
-        print(f"[{i}/{len(images)}] Processing: {os.path.basename(img)}")
-        try:
-            report = report_gen.generate_report(img, car_year, state, include_shopping)
-            reports.append(report)
-            print(f"Complete - {report['damaged_part']['part']} ({report['damaged_part']['severity']})")
-        except Exception as e:
-            print(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
+    # Generate reports for each image, journaling every finished one
+    tta_budget = new_budget(args.tta_budget) if args.tta else None
+    if args.daemon:
+        reports = process_images_daemon(images, completed, journal, car_year, state, include_shopping,
+                                        tta_budget, args)
+    elif args.async_io:
+        reports = process_images_async(images, completed, journal, car_year, state, include_shopping,
+                                       tta_budget, args)
+    else:
+        reports = process_images(images, completed, journal, car_year, state, include_shopping,
+                                 tta_budget, args)
+    
+    if tta_budget is not None:
+        print(f"\nTTA: {tta_budget['used']} extra forward pass(es) used of {args.tta_budget}")
     
     if not reports:
         print("\nNo reports generated successfully.")
@@ -110,34 +366,40 @@ def main():
     if include_shopping:
         shopping_guides = output[1]
     
+    if args.cost_interval:
+        add_cost_intervals(aggregated_report, state=state, samples=args.cost_samples)
 
     # Print summary to console
-    report_gen.print_report_summary(aggregated_report)
+    if not args.quiet:
+        report_gen.print_report_summary(aggregated_report)
     
     # Save reports
     print(f"\n{'='*70}")
     print("SAVING REPORTS")
     print("="*70 + "\n")
     
-    # Save complete report (original)
-    json_report_output = report_gen.save_report(aggregated_report, filename="report")
+    # All files of this run go into one uniquely named folder under outputs/
+    run_dir = create_run_dir("outputs")
+    print(f"Run ID: {run_dir.name}")
     
-    if include_shopping:
-        json_shopping_output = report_gen.save_report(shopping_guides, filename="shopping_guide")
-        complete_report = aggregated_report
-        complete_report["shopping_guides"] = shopping_guides
-    else:
-        json_shopping_output = None
+    # Save complete report in every requested format (the first one is shown in next steps)
+    json_report_output, json_shopping_output, shopping_output = report_gen.save_all_reports(
+        aggregated_report,
+        shopping_guides if include_shopping else None,
+        run_dir=run_dir,
+        formats=args.formats,
+        guide_formats=args.guide_formats
+    )
     
-    # Save shopping guide if included
-    if include_shopping and "shopping_guides" in complete_report:
-        shopping_output = report_gen.save_shopping_guide_text(complete_report)
+    # Point to the shopping guide if included
+    if not args.quiet:
         if shopping_output:
             print(f"\nTIP: Check the shopping guide for where to buy parts!")
             print(f"   File: {shopping_output}")
-    
-    # Print next steps
-    report_gen.print_next_steps(json_report_output, json_shopping_output)
+        
+        # Print next steps
+        report_gen.print_next_steps(include_shopping, json_report_output,
+                                    shopping_output or "No shopping guide generated")
     
     print("\nReport complete! Thank you for using AutoClaimAI.")
     print("="*70 + "\n")
@@ -0,0 +1,287 @@
+'''
+Three-stage producer/consumer pipeline that overlaps disk reads, inference and report writes.
+Reader threads prefetch and decode images, the calling thread runs batched inference with
+generate_reports, and a writer thread saves results. The stages are connected by bounded queues,
+so slow network storage no longer leaves the CPU idle. A latency injector simulates slow storage.
+'''
+
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import report_generator as report_gen
+from .image_ingest import prepare_image, DEFAULT_MAX_SIDE
+from .confidence import DEFAULT_TTA_THRESHOLD
+
+# Marks the end of a queue
+_DONE = object()
+
+
+def read_image(image_path, max_side=DEFAULT_MAX_SIDE, thumbnail_cache=False, read_latency=0.0):
+    """
+    Read and decode one image, optionally waiting first to simulate slow storage.
+
+    Args:
+        image_path: Path to the image
+        max_side: Resolution cap (None or 0 decodes the full image)
+        thumbnail_cache: Whether to use the thumbnail cache
+        read_latency: Seconds of artificial latency per read
+
+    Returns:
+        Decoded RGB PIL image
+    """
+    if read_latency:
+        time.sleep(read_latency)
+
+    if max_side:
+        return prepare_image(image_path, max_side, cache=thumbnail_cache)
+
+    from PIL import Image
+    with Image.open(image_path) as img:
+        return img.convert("RGB")
+
+
+def busy_seconds(intervals):
+    """
+    Wall-clock time covered by a stage's busy intervals, counting time when several of its
+    threads were busy at once only once.
+
+    Args:
+        intervals: List of (start, end) perf_counter times
+
+    Returns:
+        Seconds during which at least one interval was open
+    """
+    total = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def infer_batch(jobs, batch_size, options, infer_func):
+    """
+    Run inference on a batch, falling back to one image at a time if the batch fails.
+
+    Args:
+        jobs: Jobs with decoded "image" entries
+        batch_size: Images per forward pass
+        options: Keyword arguments for infer_func
+        infer_func: Function with the signature of report_generator.generate_reports
+
+    Returns:
+        List of (report, error) tuples, one per job
+    """
+    try:
+        return [(report, None) for report in infer_func(jobs, batch_size=batch_size, **options)]
+    except Exception:
+        pass
+
+    results = []
+    for job in jobs:
+        try:
+            results.append((infer_func([job], batch_size=1, **options)[0], None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def run_pipeline(jobs, batch_size=8, readers=4, queue_size=16, max_side=DEFAULT_MAX_SIDE,
+                 thumbnail_cache=False, stage_timeout=None, tta_threshold=DEFAULT_TTA_THRESHOLD,
+                 write_func=None, fail_func=None, infer_func=None, read_latency=0.0, write_latency=0.0,
+                 roi_mode=None):
+    """
+    Generate reports for jobs with reads, inference and writes running concurrently.
+
+    Args:
+        jobs: Job dictionaries as for report_generator.generate_reports()
+        batch_size: Images per inference batch
+        readers: Reader threads prefetching images
+        queue_size: Capacity of the read and write queues (bounds memory use)
+        max_side: Resolution cap for decoded images
+        thumbnail_cache: Whether to use the thumbnail cache
+        stage_timeout: Seconds each model stage may take per batch
+        tta_threshold: Confidence below which TTA views are run for jobs with a budget
+        write_func: Called as write_func(job, report) on the writer thread for every report (optional).
+                    If it (or fail_func) raises, the pipeline stops and the first error is re-raised here.
+        fail_func: Called as fail_func(job, error) on the writer thread for every failed image (optional)
+        infer_func: Inference function (default: report_generator.generate_reports)
+        read_latency: Artificial seconds added to every read
+        write_latency: Artificial seconds added to every write
+        roi_mode: "best" or "all" to run the damage models on part crops (None uses full frames)
+
+    Returns:
+        Tuple of (reports in job order with None for failures, stats dictionary)
+    """
+    infer_func = infer_func or report_gen.generate_reports
+    options = {"max_side": max_side, "thumbnail_cache": thumbnail_cache,
+               "stage_timeout": stage_timeout, "tta_threshold": tta_threshold, "roi_mode": roi_mode}
+
+    read_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    reports = [None] * len(jobs)
+    # Busy (start, end) intervals of each stage, merged per stage so parallel readers count once
+    busy = {"read": [], "infer": [], "write": []}
+    lock = threading.Lock()
+
+    def timed_read(job):
+        start = time.perf_counter()
+        try:
+            return read_image(job["image_path"], max_side, thumbnail_cache, read_latency)
+        finally:
+            with lock:
+                busy["read"].append((start, time.perf_counter()))
+
+    # Stage 1: submit reads in order, the bounded queue limits how far ahead they run
+    executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="reader")
+    futures = []
+
+    # Set when the writer failed, so reading and inference stop early
+    stop = threading.Event()
+    write_errors = []
+
+    def feed():
+        for index, job in enumerate(jobs):
+            if stop.is_set():
+                break
+            future = executor.submit(timed_read, job)
+            futures.append(future)
+            read_queue.put((index, future))
+        read_queue.put(_DONE)
+
+    # Stage 3: write reports (and record failures) as they come out of inference
+    def write():
+        while True:
+            item = write_queue.get()
+            if item is _DONE:
+                return
+            if write_errors:
+                continue  # keep draining so inference never blocks on a full queue
+            job, report, error = item
+            start = time.perf_counter()
+            try:
+                if write_latency:
+                    time.sleep(write_latency)
+                if report is not None and write_func:
+                    write_func(job, report)
+                elif report is None and fail_func:
+                    fail_func(job, error)
+            except Exception as e:
+                write_errors.append(e)
+                stop.set()
+            finally:
+                with lock:
+                    busy["write"].append((start, time.perf_counter()))
+
+    feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+    writer = threading.Thread(target=write, name="writer", daemon=True)
+    start = time.perf_counter()
+    feeder.start()
+    writer.start()
+
+    # Stage 2: inference on this thread, one batch at a time
+    finished = False
+    while not finished and not stop.is_set():
+        batch = []
+        while len(batch) < batch_size:
+            item = read_queue.get()
+            if item is _DONE:
+                finished = True
+                break
+
+            index, future = item
+            job = jobs[index]
+            try:
+                batch.append((index, dict(job, image=future.result())))
+            except Exception as e:
+                write_queue.put((job, None, e))
+
+        if not batch:
+            continue
+
+        infer_start = time.perf_counter()
+        results = infer_batch([job for _, job in batch], batch_size, options, infer_func)
+        with lock:
+            busy["infer"].append((infer_start, time.perf_counter()))
+
+        for (index, job), (report, error) in zip(batch, results):
+            reports[index] = report
+            job.pop("image", None)
+            write_queue.put((jobs[index], report, error))
+
+    # After a write error, let the feeder reach the end of its queue
+    if stop.is_set() and not finished:
+        while read_queue.get() is not _DONE:
+            pass
+
+    write_queue.put(_DONE)
+    writer.join()
+    # Reads that have not started are not needed after a write error (cancel_futures needs Python 3.9)
+    for future in futures:
+        future.cancel()
+    executor.shutdown()
+    if write_errors:
+        raise write_errors[0]
+    wall = time.perf_counter() - start
+
+    seconds = {stage: busy_seconds(intervals) for stage, intervals in busy.items()}
+    stats = {
+        "images": len(jobs),
+        "wall_seconds": round(wall, 3),
+        "read_seconds": round(seconds["read"], 3),
+        "infer_seconds": round(seconds["infer"], 3),
+        "write_seconds": round(seconds["write"], 3),
+        # Wall-clock busy time of the three stages over wall time: 1.0 means no overlap, up to 3.0
+        "overlap": round(sum(seconds.values()) / wall, 2) if wall else None
+    }
+    return reports, stats
+
+
+def run_sequential(jobs, batch_size=8, max_side=DEFAULT_MAX_SIDE, thumbnail_cache=False,
+                   stage_timeout=None, tta_threshold=DEFAULT_TTA_THRESHOLD, write_func=None,
+                   fail_func=None, infer_func=None, read_latency=0.0, write_latency=0.0, roi_mode=None):
+    """
+    Same work as run_pipeline() without any overlap, as a baseline for measurements.
+
+    Args:
+        See run_pipeline()
+
+    Returns:
+        Tuple of (reports in job order with None for failures, stats dictionary)
+    """
+    infer_func = infer_func or report_gen.generate_reports
+    options = {"max_side": max_side, "thumbnail_cache": thumbnail_cache,
+               "stage_timeout": stage_timeout, "tta_threshold": tta_threshold, "roi_mode": roi_mode}
+    reports = [None] * len(jobs)
+    start = time.perf_counter()
+
+    for offset in range(0, len(jobs), batch_size):
+        batch = []
+        for index in range(offset, min(offset + batch_size, len(jobs))):
+            job = jobs[index]
+            try:
+                batch.append((index, dict(job, image=read_image(job["image_path"], max_side,
+                                                                thumbnail_cache, read_latency))))
+            except Exception as e:
+                if fail_func:
+                    fail_func(job, e)
+
+        results = infer_batch([job for _, job in batch], batch_size, options, infer_func)
+        for (index, job), (report, error) in zip(batch, results):
+            if write_latency:
+                time.sleep(write_latency)
+            if report is not None and write_func:
+                write_func(jobs[index], report)
+            elif report is None and fail_func:
+                fail_func(jobs[index], error)
+            reports[index] = report
+
+    wall = time.perf_counter() - start
+    return reports, {"images": len(jobs), "wall_seconds": round(wall, 3)}
@@ -0,0 +1,271 @@
+'''
+Manifest-driven batch mode for processing many claims in one invocation.
+Models stay loaded for the whole run and images from different claims are interleaved into
+shared inference batches. Each claim still gets its own aggregated report and run folder.
+'''
+
+import os
+import re
+import csv
+import json
+import time
+import traceback
+from pathlib import Path
+from . import report_generator as report_gen
+from .output_store import create_run_dir, new_run_id
+from .report_writers import DEFAULT_FORMAT
+from .image_ingest import DEFAULT_MAX_SIDE
+from .confidence import new_budget, DEFAULT_TTA_THRESHOLD
+from .cost_simulation import add_cost_intervals
+from .render import DEFAULT_GUIDE_FORMAT
+
+SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def parse_bool(value, default=True):
+    """
+    Parse a yes/no manifest value.
+
+    Args:
+        value: Value from the manifest (bool, string or None)
+        default: Value to use when the field is empty
+
+    Returns:
+        Boolean
+    """
+    if isinstance(value, bool):
+        return value
+    if value is None or str(value).strip() == "":
+        return default
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def load_manifest(manifest_path):
+    """
+    Load a claim manifest from a CSV or JSON file.
+
+    CSV files need a header with at least "folder" and "year" columns, and may add
+    "state", "include_shopping" and "claim_id". JSON files hold a list of objects
+    with the same keys.
+
+    Args:
+        manifest_path: Path to the .csv or .json manifest
+
+    Returns:
+        List of claim dictionaries
+    """
+    manifest_path = Path(manifest_path)
+
+    if manifest_path.suffix.lower() == ".json":
+        with open(manifest_path, "r") as f:
+            rows = json.load(f)
+    else:
+        with open(manifest_path, "r", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    claims = []
+    for i, row in enumerate(rows, 1):
+        if not row.get("folder") or not row.get("year"):
+            raise ValueError(f"Manifest entry {i} needs a 'folder' and a 'year'")
+
+        # Relative folders are relative to the manifest
+        folder = Path(row["folder"])
+        if not folder.is_absolute():
+            folder = manifest_path.parent / folder
+
+        state = (row.get("state") or "").strip().replace(" ", "_") or None
+        claims.append({
+            "claim_id": str(row.get("claim_id") or folder.name),
+            "folder": str(folder),
+            "car_year": str(row["year"]).strip(),
+            "state": state,
+            "include_shopping": parse_bool(row.get("include_shopping"))
+        })
+
+    return claims
+
+
+def find_images(folder):
+    """
+    List the supported images in a folder.
+
+    Args:
+        folder: Folder to search
+
+    Returns:
+        Sorted list of image paths
+    """
+    return [os.path.join(folder, f) for f in sorted(os.listdir(folder))
+            if f.lower().endswith(SUPPORTED_EXT)]
+
+
+def interleave_jobs(claims):
+    """
+    Build inference jobs that alternate between claims (round robin), so every
+    batch mixes images from several vehicles and claims finish at a steady rate.
+
+    Args:
+        claims: Claims from load_manifest() with an "images" list
+
+    Returns:
+        List of job dictionaries for report_generator.generate_reports()
+    """
+    jobs = []
+    longest = max((len(claim["images"]) for claim in claims), default=0)
+
+    for i in range(longest):
+        for index, claim in enumerate(claims):
+            if i < len(claim["images"]):
+                jobs.append({
+                    "claim_index": index,
+                    "image_path": claim["images"][i],
+                    "car_year": claim["car_year"],
+                    "state": claim["state"],
+                    "include_shopping": claim["include_shopping"],
+                    "tta_budget": claim.get("tta_budget")
+                })
+
+    return jobs
+
+
+def run_jobs(jobs, batch_size, **options):
+    """
+    Run one batch of jobs, falling back to one image at a time if the batch fails
+    so that a single bad image does not drop the others.
+
+    Args:
+        jobs: Jobs for this batch
+        batch_size: Images per forward pass
+        **options: max_side, thumbnail_cache, stage_timeout, tta_threshold and roi_mode for the report generator
+
+    Returns:
+        List of reports (None for images that failed)
+    """
+    try:
+        return report_gen.generate_reports(jobs, batch_size=batch_size, **options)
+    except Exception as e:
+        print(f"Batch failed ({e}), retrying images one at a time")
+
+    reports = []
+    for job in jobs:
+        try:
+            reports.append(report_gen.generate_reports([job], batch_size=1, **options)[0])
+        except Exception as e:
+            print(f"Error: {os.path.basename(job['image_path'])}: {e}")
+            traceback.print_exc()
+            reports.append(None)
+    return reports
+
+
+def save_claim(claim, reports, formats, output_dir="outputs", cost_samples=None,
+               guide_formats=(DEFAULT_GUIDE_FORMAT,)):
+    """
+    Aggregate and save the reports of one finished claim.
+
+    Args:
+        claim: Claim dictionary
+        reports: Reports of the claim's images
+        formats: Report formats to save
+        output_dir: Outputs folder
+        cost_samples: Monte Carlo draws per damage for cost intervals (None skips the simulation)
+        guide_formats: Readable shopping guide formats
+
+    Returns:
+        Path of the saved report, or None if no image of the claim succeeded
+    """
+    if not reports:
+        print(f"Claim {claim['claim_id']}: no reports generated successfully")
+        return None
+
+    aggregated_report, shopping_guides = report_gen.aggregate_reports(reports)
+    aggregated_report["claim_id"] = claim["claim_id"]
+    if cost_samples:
+        add_cost_intervals(aggregated_report, state=claim["state"], samples=cost_samples)
+
+    safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", claim["claim_id"])
+    run_dir = create_run_dir(output_dir, run_id=f"{new_run_id()}-{safe_id}")
+    report_path, _, _ = report_gen.save_all_reports(aggregated_report, shopping_guides,
+                                                    run_dir=run_dir, formats=formats,
+                                                    guide_formats=guide_formats)
+    return report_path
+
+
+def run_batch(manifest_path, batch_size=8, formats=(DEFAULT_FORMAT,), output_dir="outputs",
+              max_side=DEFAULT_MAX_SIDE, thumbnail_cache=False, stage_timeout=None,
+              tta_budget=None, tta_threshold=DEFAULT_TTA_THRESHOLD, roi_mode=None, cost_samples=None,
+              guide_formats=(DEFAULT_GUIDE_FORMAT,)):
+    """
+    Process every claim of a manifest in one process.
+
+    Args:
+        manifest_path: Path to the CSV or JSON manifest
+        batch_size: Images per inference batch (images from different claims are mixed)
+        formats: Report formats to save for each claim
+        output_dir: Outputs folder
+        max_side: Resolution cap for decoded images
+        thumbnail_cache: Whether to cache downscaled images next to the inputs
+        stage_timeout: Seconds each model stage may take per batch
+        tta_budget: Extra TTA forward passes allowed per claim (None disables TTA)
+        tta_threshold: Confidence below which TTA views are run
+        roi_mode: "best" or "all" to run the damage models on part crops (None uses full frames)
+        cost_samples: Monte Carlo draws per damage for cost intervals (None skips the simulation)
+        guide_formats: Readable shopping guide formats for each claim
+
+    Returns:
+        Dictionary with claim, image and throughput statistics
+    """
+    claims = load_manifest(manifest_path)
+    for claim in claims:
+        if not os.path.isdir(claim["folder"]):
+            print(f"Warning: Invalid folder for claim {claim['claim_id']}: {claim['folder']}")
+            claim["images"] = []
+        else:
+            claim["images"] = find_images(claim["folder"])
+        claim["remaining"] = len(claim["images"])
+        claim["tta_budget"] = new_budget(tta_budget) if tta_budget is not None else None
+        claim["reports"] = []
+
+    jobs = interleave_jobs(claims)
+    print(f"Manifest: {len(claims)} claim(s), {len(jobs)} image(s), batch size {batch_size}\n")
+
+    options = {"max_side": max_side, "thumbnail_cache": thumbnail_cache, "stage_timeout": stage_timeout,
+               "tta_threshold": tta_threshold, "roi_mode": roi_mode}
+    saved = 0
+    start = time.perf_counter()
+
+    for offset in range(0, len(jobs), batch_size):
+        batch_jobs = jobs[offset:offset + batch_size]
+        print(f"[{offset + len(batch_jobs)}/{len(jobs)}] Running batch of {len(batch_jobs)} image(s)")
+
+        for job, report in zip(batch_jobs, run_jobs(batch_jobs, batch_size, **options)):
+            claim = claims[job["claim_index"]]
+            if report is not None:
+                claim["reports"].append(report)
+            claim["remaining"] -= 1
+
+            # Save each claim as soon as its last image is done
+            if claim["remaining"] == 0:
+                if save_claim(claim, claim["reports"], formats, output_dir, cost_samples, guide_formats):
+                    saved += 1
+                claim["reports"] = []
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "claims": len(claims),
+        "claims_saved": saved,
+        "images": len(jobs),
+        "seconds": round(elapsed, 2),
+        "claims_per_hour": round(len(claims) / elapsed * 3600, 1) if elapsed else None,
+        "images_per_second": round(len(jobs) / elapsed, 2) if elapsed else None
+    }
+
+    print(f"\n{'='*70}")
+    print("BATCH COMPLETE")
+    print("="*70)
+    print(f"Claims saved:  {saved}/{len(claims)}")
+    print(f"Images:        {len(jobs)} in {elapsed:.1f}s")
+    if elapsed:
+        print(f"Throughput:    {stats['claims_per_hour']} claims/hour, "
+              f"{stats['images_per_second']} images/sec")
+
+    return stats
@@ -1,16 +1,23 @@
 '''
 Uses a pre-trained model to detect the make and model of the car from an image.
+The model is loaded once per process and kept resident.
 '''
 
+from functools import lru_cache
+from .model_store import resolve_model
+
+# Number of make/model scores kept per image (the model knows hundreds of cars)
+CAR_TOP_K = 5
+
 # From 'https://huggingface.co/dima806/car_models_image_detection'
 
-def classify_car(image_path):
+@lru_cache(maxsize=None)
+def load_car_model():
     from transformers import pipeline
-    pipe = pipeline("image-classification", model="dima806/car_models_image_detection", device=0, use_fast=True)
-    result = pipe(image_path)
-    
-    make_and_model = result[0]["label"]
-    
+    return pipeline("image-classification", model=resolve_model("car"), device=0, use_fast=True)
+
+
+def split_make_and_model(make_and_model):
     split_string = make_and_model.split(' ')
 
     make = split_string[0]
@@ -22,3 +29,23 @@ def classify_car(image_path):
     
     return make.upper(), model.upper()
 
+
+# Predicts the make and model label with the top scores for a batch of images
+def predict_car_batch(images, batch_size=8):
+    pipe = load_car_model()
+    results = pipe(list(images), batch_size=batch_size, top_k=CAR_TOP_K)
+
+    predictions = []
+    for result in results:
+        scores = {x["label"]: x["score"] for x in result}
+        predictions.append({"label": result[0]["label"], "scores": scores})
+    return predictions
+
+
+# Classifies the make and model for a batch of images
+def classify_car_batch(images, batch_size=8):
+    return [split_make_and_model(p["label"]) for p in predict_car_batch(images, batch_size)]
+
+
+def classify_car(image_path):
+    return classify_car_batch([image_path])[0]
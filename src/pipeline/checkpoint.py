@@ -0,0 +1,232 @@
+'''
+Checkpoint journal and failure isolation for processing a folder of images.
+Each finished image is appended to a journal as soon as its report is ready, so a killed run
+can be resumed without repeating inference. Stages can be given a timeout and images a bounded
+number of retries.
+'''
+
+import os
+import hashlib
+import threading
+import traceback
+from pathlib import Path
+from datetime import datetime
+from .output_store import append_jsonl, read_jsonl
+
+# Journals live in the outputs folder, so read-only input shares work too
+JOURNAL_DIRNAME = "journals"
+
+
+# Stage threads left running by a timeout, they still hold the shared (not thread-safe) models
+_abandoned = []
+
+
+class StageTimeout(Exception):
+    """Raised when a pipeline stage does not finish within its timeout."""
+
+
+def journal_path(input_path, output_dir="outputs"):
+    """
+    Get the journal file for an input folder.
+
+    Args:
+        input_path: Folder of images being processed
+        output_dir: Outputs folder (default: "outputs")
+
+    Returns:
+        Path of the journal file
+    """
+    folder = str(Path(input_path).resolve())
+    digest = hashlib.sha1(folder.encode()).hexdigest()[:16]
+    return Path(output_dir) / JOURNAL_DIRNAME / f"{Path(folder).name}-{digest}.jsonl"
+
+
+def image_fingerprint(image_path):
+    """
+    Fingerprint an image file by size and modification time.
+
+    Args:
+        image_path: Path to the image
+
+    Returns:
+        Fingerprint string
+    """
+    stat = os.stat(image_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def start_journal(path, settings):
+    """
+    Start a new journal, discarding any previous one for the same folder.
+
+    Args:
+        path: Journal file from journal_path()
+        settings: Run settings to store (year, state, options) for --resume
+    """
+    os.makedirs(Path(path).parent, exist_ok=True)
+    if Path(path).exists():
+        os.remove(path)
+
+    append_jsonl(path, {"event": "start", "time": datetime.now().isoformat(), "settings": settings})
+
+
+def load_journal(path):
+    """
+    Load the settings and finished images of a journal.
+
+    Args:
+        path: Journal file from journal_path()
+
+    Returns:
+        Tuple of (settings or None, {image name: journal record} of finished images)
+    """
+    settings = None
+    completed = {}
+
+    for record in read_jsonl(path):
+        if record.get("event") == "start":
+            settings = record.get("settings")
+        elif record.get("event") == "done":
+            completed[record["image"]] = record
+        elif record.get("event") == "failed":
+            completed.pop(record["image"], None)
+
+    return settings, completed
+
+
+def get_completed_report(completed, image_path):
+    """
+    Get the journaled report of an image if it finished and has not changed since.
+
+    Args:
+        completed: Finished images from load_journal()
+        image_path: Path to the image
+
+    Returns:
+        The saved report, or None if the image still needs processing
+    """
+    record = completed.get(os.path.basename(image_path))
+    if record is None or record.get("fingerprint") != image_fingerprint(image_path):
+        return None
+    return record["report"]
+
+
+def record_success(path, image_path, report):
+    """
+    Append a finished image and its report to the journal.
+
+    Args:
+        path: Journal file
+        image_path: Path to the image
+        report: Report from generate_report()
+    """
+    append_jsonl(path, {
+        "event": "done",
+        "image": os.path.basename(image_path),
+        "fingerprint": image_fingerprint(image_path),
+        "time": datetime.now().isoformat(),
+        "report": report
+    })
+
+
+def record_failure(path, image_path, error, attempts):
+    """
+    Append a failed image to the journal.
+
+    Args:
+        path: Journal file
+        image_path: Path to the image
+        error: The exception that was raised on the last attempt
+        attempts: Number of attempts made
+    """
+    append_jsonl(path, {
+        "event": "failed",
+        "image": os.path.basename(image_path),
+        "time": datetime.now().isoformat(),
+        "attempts": attempts,
+        "error": f"{type(error).__name__}: {error}"
+    })
+
+
+def wait_for_abandoned(timeout=None):
+    """
+    Wait for stage threads abandoned by earlier timeouts to finish.
+
+    Args:
+        timeout: Seconds to wait for each thread (None waits forever)
+
+    Raises:
+        StageTimeout: If an abandoned thread is still running after the wait
+    """
+    while _abandoned:
+        thread = _abandoned[0]
+        thread.join(timeout)
+        if thread.is_alive():
+            raise StageTimeout(f"{thread.name} from an earlier timeout is still running, "
+                               "not starting another stage on the same models")
+        _abandoned.pop(0)
+
+
+def run_with_timeout(func, *args, timeout=None, **kwargs):
+    """
+    Run a function, giving up if it takes longer than the timeout.
+
+    The function runs in a daemon thread, which is abandoned on timeout
+    (Python threads cannot be killed) and does not keep the process alive.
+    The models are shared and not thread-safe, so before starting, a thread
+    abandoned by an earlier timeout is given the same timeout to finish, and
+    StageTimeout is raised instead of running two stages at once.
+
+    Args:
+        func: Function to call
+        *args, **kwargs: Arguments for the function
+        timeout: Seconds to wait (None waits forever and calls func directly)
+
+    Returns:
+        The return value of func
+    """
+    wait_for_abandoned(timeout or None)
+    if not timeout:
+        return func(*args, **kwargs)
+
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, name=f"stage-{func.__name__}", daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+    if thread.is_alive():
+        _abandoned.append(thread)
+        raise StageTimeout(f"{func.__name__} did not finish within {timeout}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def run_with_retries(func, retries=1):
+    """
+    Call a function, retrying it a bounded number of times if it raises.
+
+    Args:
+        func: Function without arguments to call
+        retries: Number of retries after the first attempt
+
+    Returns:
+        The return value of func (the last exception is raised once retries run out)
+    """
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            return func()
+        except Exception as e:
+            if attempts > retries:
+                raise
+            print(f"Attempt {attempts} failed ({type(e).__name__}: {e}), retrying...")
+            traceback.print_exc()
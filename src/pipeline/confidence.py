@@ -0,0 +1,267 @@
+'''
+Calibrated confidence scores and adaptive test-time augmentation (TTA).
+Raw model scores are temperature scaled with the per-stage temperatures in src/models/calibration.json.
+The file only lists stages whose temperature was fitted on labeled data with fit_temperature(); it ships
+empty, so until a stage is fitted its confidences are the model's raw scores.
+Predictions below a confidence threshold get extra flipped/cropped views, run together in one batch,
+and the averaged scores replace the original ones. A per-claim budget caps the extra forward passes.
+'''
+
+import json
+import math
+from functools import lru_cache
+from pathlib import Path
+
+CALIBRATION_PATH = Path(__file__).resolve().parent.parent / "models" / "calibration.json"
+
+# Stages whose scores form one softmax distribution. The part detector scores every box on its own.
+DISTRIBUTION_STAGES = ("car", "type_of_damage", "severity")
+
+DEFAULT_TTA_THRESHOLD = 0.6
+DEFAULT_TTA_BUDGET = 16  # Extra forward passes per claim
+TTA_VIEWS = ("hflip", "crop", "hflip_crop")
+CROP_FRACTION = 0.85
+
+# Damaged parts with any stage below this confidence are flagged for a human look
+# (raw scores for stages without a fitted temperature)
+REVIEW_THRESHOLD = 0.5
+
+EPSILON = 1e-6
+
+
+@lru_cache(maxsize=None)
+def load_calibration(path=CALIBRATION_PATH):
+    """
+    Load the fitted per-stage temperatures. Stages that are not listed use 1.0 (no change).
+
+    Args:
+        path: Calibration JSON file
+
+    Returns:
+        Dictionary of {stage: temperature}
+    """
+    if not Path(path).exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def fitted_stages():
+    """Stages whose temperature was fitted, i.e. whose confidences are actually calibrated"""
+    return set(load_calibration())
+
+
+def save_calibration(temperatures, path=CALIBRATION_PATH):
+    """
+    Save per-stage temperatures, keeping the stages that are not given.
+
+    Args:
+        temperatures: Dictionary of {stage: temperature}
+        path: Calibration JSON file
+    """
+    calibration = dict(load_calibration(path))
+    calibration.update({stage: round(t, 4) for stage, t in temperatures.items()})
+
+    with open(path, "w") as f:
+        json.dump(calibration, f, indent=2)
+    load_calibration.cache_clear()
+
+
+def calibrate_scores(scores, stage, temperature=None):
+    """
+    Temperature scale the raw scores of one prediction.
+
+    For softmax stages p ** (1 / T) renormalized is the same as dividing the logits by T.
+    For the part detector each box confidence is scaled on its own as sigmoid(logit(p) / T).
+    The car model only keeps its top scores, so the probability left to the other labels is kept
+    as one residual term when renormalizing. Stages without a fitted temperature are returned unchanged.
+
+    Args:
+        scores: Dictionary of {label: raw score}
+        stage: Stage name ("car", "part", "type_of_damage" or "severity")
+        temperature: Temperature to use (optional, read from the calibration file if None)
+
+    Returns:
+        Dictionary of {label: calibrated score}
+    """
+    if not scores:
+        return {}
+
+    if temperature is None:
+        if stage not in load_calibration():
+            return dict(scores)
+        temperature = load_calibration()[stage]
+
+    if stage in DISTRIBUTION_STAGES:
+        powered = {label: max(score, EPSILON) ** (1 / temperature) for label, score in scores.items()}
+        # Mass of the labels a truncated top-k left out, so the kept labels are not inflated
+        residual = 1.0 - sum(scores.values())
+        total = sum(powered.values()) + (residual ** (1 / temperature) if residual > EPSILON else 0.0)
+        return {label: value / total for label, value in powered.items()}
+
+    calibrated = {}
+    for label, score in scores.items():
+        score = min(max(score, EPSILON), 1 - EPSILON)
+        logit = math.log(score / (1 - score))
+        calibrated[label] = 1 / (1 + math.exp(-logit / temperature))
+    return calibrated
+
+
+def finalize_prediction(prediction, stage):
+    """
+    Add the calibrated scores and confidence to a prediction from a predict_*_batch function.
+
+    Args:
+        prediction: Dictionary with "label" and raw "scores" (updated in place)
+        stage: Stage name
+
+    Returns:
+        The updated prediction
+    """
+    calibrated = calibrate_scores(prediction["scores"], stage)
+    prediction["calibrated"] = calibrated
+    prediction["confidence"] = calibrated.get(prediction["label"], 0.0)
+    return prediction
+
+
+def new_budget(extra_passes=DEFAULT_TTA_BUDGET):
+    """
+    Create a TTA budget shared by all images of one claim.
+
+    Args:
+        extra_passes: Maximum augmented views the claim may run
+
+    Returns:
+        Mutable budget dictionary
+    """
+    return {"remaining": extra_passes, "used": 0}
+
+
+def augment_image(image, view):
+    """
+    Create an augmented view of an image.
+
+    Args:
+        image: PIL image or image path
+        view: One of TTA_VIEWS
+
+    Returns:
+        Augmented PIL image
+    """
+    from PIL import Image, ImageOps
+
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as img:
+            image = img.convert("RGB")
+
+    if "crop" in view:
+        width, height = image.size
+        crop_w, crop_h = int(width * CROP_FRACTION), int(height * CROP_FRACTION)
+        left, top = (width - crop_w) // 2, (height - crop_h) // 2
+        image = image.crop((left, top, left + crop_w, top + crop_h))
+
+    if "hflip" in view:
+        image = ImageOps.mirror(image)
+
+    return image
+
+
+def average_scores(score_dicts):
+    """
+    Average several score dictionaries (labels missing from one count as 0).
+
+    Args:
+        score_dicts: List of {label: score} dictionaries
+
+    Returns:
+        Averaged {label: score} dictionary
+    """
+    totals = {}
+    for scores in score_dicts:
+        for label, score in scores.items():
+            totals[label] = totals.get(label, 0.0) + score
+    return {label: total / len(score_dicts) for label, total in totals.items()}
+
+
+def apply_tta(predictions, images, predict_func, stage, budgets, threshold=DEFAULT_TTA_THRESHOLD,
+              batch_size=8):
+    """
+    Re-run low-confidence predictions on augmented views and average in their scores.
+
+    The least confident predictions are served first, all augmented views run in one
+    batch, and every view is charged to the budget of the image's claim.
+
+    Args:
+        predictions: Finalized predictions of one stage (updated in place)
+        images: Images the predictions were made on
+        predict_func: The stage's predict_*_batch function
+        stage: Stage name
+        budgets: Budget from new_budget() per image (None disables TTA for that image)
+        threshold: Confidence below which TTA is used
+        batch_size: Images per forward pass
+
+    Returns:
+        Number of extra forward passes used
+    """
+    extra_images = []
+    owners = []
+
+    order = sorted(range(len(predictions)), key=lambda i: predictions[i]["confidence"])
+    for i in order:
+        if predictions[i]["confidence"] >= threshold:
+            break
+        # No scores (the part detector found no box), extra views cannot help
+        if not predictions[i]["scores"]:
+            continue
+        budget = budgets[i]
+        if budget is None or budget["remaining"] <= 0:
+            continue
+
+        views = TTA_VIEWS[:budget["remaining"]]
+        budget["remaining"] -= len(views)
+        budget["used"] += len(views)
+        for view in views:
+            extra_images.append(augment_image(images[i], view))
+            owners.append(i)
+
+    if not extra_images:
+        return 0
+
+    groups = {}
+    for owner, extra in zip(owners, predict_func(extra_images, batch_size)):
+        groups.setdefault(owner, [predictions[owner]["scores"]]).append(extra["scores"])
+
+    for i, score_dicts in groups.items():
+        scores = average_scores(score_dicts)
+        prediction = predictions[i]
+        prediction["scores"] = scores
+        if scores:
+            prediction["label"] = max(scores, key=scores.get)
+        prediction["tta_views"] = len(score_dicts) - 1
+        finalize_prediction(prediction, stage)
+
+    return len(extra_images)
+
+
+def fit_temperature(score_dicts, true_labels, stage):
+    """
+    Fit the temperature of a stage on labeled predictions by minimizing the negative log likelihood.
+
+    Args:
+        score_dicts: Raw {label: score} dictionaries, one per image
+        true_labels: Correct label per image
+        stage: Stage name
+
+    Returns:
+        Best temperature (float)
+    """
+    candidates = [0.25 + 0.05 * i for i in range(96)]  # 0.25 to 5.0
+
+    def nll(temperature):
+        total = 0.0
+        for scores, label in zip(score_dicts, true_labels):
+            calibrated = calibrate_scores(scores, stage, temperature)
+            total -= math.log(max(calibrated.get(label, 0.0), EPSILON))
+        return total / max(len(true_labels), 1)
+
+    return min(candidates, key=nll)
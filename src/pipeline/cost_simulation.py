@@ -0,0 +1,306 @@
+'''
+Monte Carlo repair cost simulation with uncertainty intervals.
+Instead of pricing only the top-1 severity and damage type, every sample draws a severity and a damage
+type from the (temperature scaled) probabilities of the damaged part, jitters the labor hours, draws a labor rate
+(any state's rate when the state is unknown) and a part quality tier. All damages of many claims are
+sampled together in NumPy arrays, and the P10/P50/P90 of the totals are reported per damage and per claim.
+'''
+
+from .estimate_cost import (get_labor_hours, get_part_cost, LABOR_RATES, NATIONAL_AVG_LABOR_RATE,
+                            PART_TIER_MULTIPLIERS, USED_PARTS)
+from .detect_damage import SEVERITY_LABELS
+
+DEFAULT_SAMPLES = 500
+PERCENTILES = (10, 50, 90)
+
+# Labor hours drawn from a triangular distribution around the table value (low, high factor)
+LABOR_HOURS_SPREAD = (0.8, 1.3)
+
+# Labor rate drawn around the state's rate (low, high factor)
+LABOR_RATE_SPREAD = (0.9, 1.1)
+
+# How often each part quality tier is chosen ("used" only for parts available used)
+PART_TIER_WEIGHTS = {
+    "oem": 0.3,
+    "oem_equivalent": 0.45,
+    "aftermarket": 0.2,
+    "used": 0.05
+}
+
+# Upper limit of damages x samples drawn at once, bounds the memory of one chunk
+CHUNK_ELEMENTS = 4_000_000
+
+
+def damage_distributions(damaged_part):
+    """
+    Get the severity and damage type probabilities of a damaged part.
+    Reports without probabilities count their predicted labels as certain.
+
+    Args:
+        damaged_part: "damaged_part" entry of a report
+
+    Returns:
+        Tuple of ({severity: probability}, {damage type: probability})
+    """
+    probabilities = damaged_part.get("probabilities") or {}
+    severity = probabilities.get("severity") or {damaged_part["severity"]: 1.0}
+    damage_type = probabilities.get("type_of_damage") or {damaged_part["type_of_damage"]: 1.0}
+    return severity, damage_type
+
+
+def build_tables(damages, severities, damage_types):
+    """
+    Look up the cost tables for every damage once, so sampling is pure array indexing.
+
+    Args:
+        damages: List of (part, severity probabilities, damage type probabilities, state)
+        severities: Severity labels (columns of the severity axis)
+        damage_types: Damage type labels (columns of the damage type axis)
+
+    Returns:
+        Dictionary of NumPy arrays
+    """
+    import numpy as np
+
+    hours = np.empty((len(damages), len(severities), len(damage_types)), dtype=np.float32)
+    part_cost = np.empty((len(damages), len(severities)), dtype=np.float32)
+    severity_probs = np.zeros((len(damages), len(severities)), dtype=np.float64)
+    type_probs = np.zeros((len(damages), len(damage_types)), dtype=np.float64)
+    rate = np.empty(len(damages), dtype=np.float32)
+    known_state = np.empty(len(damages), dtype=bool)
+    used_allowed = np.empty(len(damages), dtype=bool)
+
+    severity_index = {label: i for i, label in enumerate(severities)}
+    type_index = {label: i for i, label in enumerate(damage_types)}
+    lookups = {}
+
+    for d, (part, severity, damage_type, state) in enumerate(damages):
+        if part not in lookups:
+            lookups[part] = (
+                [[get_labor_hours(part, s, t) for t in damage_types] for s in severities],
+                [get_part_cost(part, s) for s in severities]
+            )
+        hours[d], part_cost[d] = lookups[part]
+
+        for label, p in severity.items():
+            severity_probs[d, severity_index[label]] = p
+        for label, p in damage_type.items():
+            type_probs[d, type_index[label]] = p
+
+        rate[d] = LABOR_RATES.get(state, NATIONAL_AVG_LABOR_RATE)
+        known_state[d] = state in LABOR_RATES
+        used_allowed[d] = part in USED_PARTS
+
+    # Normalize, rounded probabilities do not always sum to exactly 1
+    severity_probs /= severity_probs.sum(axis=1, keepdims=True)
+    type_probs /= type_probs.sum(axis=1, keepdims=True)
+
+    return {
+        "hours": hours,
+        "part_cost": part_cost,
+        "severity_cdf": np.cumsum(severity_probs, axis=1),
+        "type_cdf": np.cumsum(type_probs, axis=1),
+        "rate": rate,
+        "known_state": known_state,
+        "used_allowed": used_allowed
+    }
+
+
+def sample_categories(rng, cdf, samples):
+    """
+    Draw category indices for every row of a cumulative probability matrix.
+
+    Args:
+        rng: NumPy random generator
+        cdf: Cumulative probabilities, one row per damage
+        samples: Draws per row
+
+    Returns:
+        Integer array of shape (rows, samples)
+    """
+    import numpy as np
+
+    u = rng.random((cdf.shape[0], samples), dtype=np.float32)
+    cdf = cdf.astype(np.float32)
+
+    # There are only a handful of categories, so one comparison pass per boundary is
+    # cheaper than a binary search per draw
+    index = np.zeros(u.shape, dtype=np.int8)
+    for k in range(cdf.shape[1] - 1):
+        index += u > cdf[:, k:k + 1]
+    return index
+
+
+def sample_triangular(rng, low, mode, high, shape):
+    """
+    Draw from triangular distributions without square roots or branches. The bounds may be
+    scalars or arrays of the given shape (faster than Generator.triangular).
+
+    Args:
+        rng: NumPy random generator
+        low, mode, high: Lower bound, mode and upper bound
+        shape: Shape of the draws
+
+    Returns:
+        Float32 array of draws
+    """
+    import numpy as np
+
+    # With c the relative mode, (1 - c) * min(u1, u2) + c * max(u1, u2) is triangular on [0, 1]
+    u1 = rng.random(shape, dtype=np.float32)
+    u2 = rng.random(shape, dtype=np.float32)
+    draws = np.minimum(u1, u2)
+    larger = np.maximum(u1, u2, out=u1)
+    draws *= high - mode
+    larger *= mode - low
+    draws += larger
+    draws += low
+    return draws
+
+
+def sample_costs(tables, samples, rng):
+    """
+    Draw total repair costs for a chunk of damages.
+
+    Args:
+        tables: Arrays from build_tables() for the chunk
+        samples: Draws per damage
+        rng: NumPy random generator
+
+    Returns:
+        Float32 array of shape (damages, samples)
+    """
+    import numpy as np
+
+    n = tables["rate"].shape[0]
+    rows = np.arange(n)[:, None]
+    shape = (n, samples)
+
+    severity = sample_categories(rng, tables["severity_cdf"], samples)
+    damage_type = sample_categories(rng, tables["type_cdf"], samples)
+
+    low, high = LABOR_HOURS_SPREAD
+    hours = tables["hours"][rows, severity, damage_type] * sample_triangular(rng, low, 1.0, high, shape)
+
+    low, high = LABOR_RATE_SPREAD
+    rate = tables["rate"][:, None] * sample_triangular(rng, low, 1.0, high, shape)
+    unknown = ~tables["known_state"]
+    if unknown.any():
+        # No state given: any state's rate is possible
+        state_rates = np.array([r for state, r in LABOR_RATES.items() if state != "National_Average"],
+                               dtype=np.float32)
+        rate[unknown] = state_rates[rng.integers(len(state_rates), size=(int(unknown.sum()), samples))]
+
+    tiers = list(PART_TIER_MULTIPLIERS)
+    weights = np.array([PART_TIER_WEIGHTS[tier] for tier in tiers])
+    tier_weights = np.where(tables["used_allowed"][:, None], weights,
+                            np.where(np.array(tiers) == "used", 0.0, weights))
+    tier_cdf = np.cumsum(tier_weights / tier_weights.sum(axis=1, keepdims=True), axis=1)
+    tier = sample_categories(rng, tier_cdf, samples)
+
+    low, mode, high = (np.array(values, dtype=np.float32) for values in zip(*PART_TIER_MULTIPLIERS.values()))
+    multiplier = sample_triangular(rng, low[tier], mode[tier], high[tier], shape)
+
+    costs = tables["part_cost"][rows, severity]
+    costs *= multiplier
+    hours *= rate
+    costs += hours
+    return costs
+
+
+def interval(values):
+    """
+    Summarize draws along the last axis as {"p10", "p50", "p90"} dictionaries.
+
+    Args:
+        values: Array of draws, 1-D for one interval or 2-D for one interval per row
+
+    Returns:
+        Interval dictionary, or a list of them for 2-D input
+    """
+    import numpy as np
+
+    # Nearest-rank percentiles: one partition instead of a full sort and interpolation
+    samples = values.shape[-1]
+    ranks = [min(samples - 1, int(round(p / 100 * (samples - 1)))) for p in PERCENTILES]
+    points = np.partition(values, ranks, axis=-1)[..., ranks].tolist()
+
+    if values.ndim == 1:
+        return {f"p{p}": round(v, 2) for p, v in zip(PERCENTILES, points)}
+    return [{f"p{p}": round(v, 2) for p, v in zip(PERCENTILES, row)} for row in points]
+
+
+def simulate_claims(claims, samples=DEFAULT_SAMPLES, seed=None):
+    """
+    Simulate the repair cost of many claims at once.
+
+    Args:
+        claims: List of claims, each a dictionary with "damaged_parts" (report entries) and
+                optionally "state"
+        samples: Monte Carlo draws per damage
+        seed: Random seed for reproducible intervals (optional)
+
+    Returns:
+        Tuple of (list of per-damage interval lists, list of claim intervals), in claim order
+    """
+    import numpy as np
+
+    damages, owners = [], []
+    for c, claim in enumerate(claims):
+        for damaged_part in claim["damaged_parts"]:
+            severity, damage_type = damage_distributions(damaged_part)
+            damages.append((damaged_part["part"], severity, damage_type, claim.get("state")))
+            owners.append(c)
+
+    severities = list(SEVERITY_LABELS) + sorted({s for d in damages for s in d[1]} - set(SEVERITY_LABELS))
+    damage_types = sorted({t for d in damages for t in d[2]})
+
+    rng = np.random.default_rng(seed)
+    owners = np.array(owners, dtype=np.int64)
+    claim_totals = np.zeros((len(claims), samples), dtype=np.float32)
+    damage_intervals = []
+
+    # Sample a chunk of damages at a time and add each draw to its claim's total
+    widest = max(len(severities), len(damage_types), len(PART_TIER_MULTIPLIERS))
+    chunk = max(1, CHUNK_ELEMENTS // (samples * widest))
+    for start in range(0, len(damages), chunk):
+        tables = build_tables(damages[start:start + chunk], severities, damage_types)
+        costs = sample_costs(tables, samples, rng)
+
+        # Damages of a claim are consecutive, so each claim's draws are one segment to sum
+        claim_ids, segments = np.unique(owners[start:start + chunk], return_index=True)
+        claim_totals[claim_ids] += np.add.reduceat(costs, segments, axis=0)
+        damage_intervals.extend(interval(costs))
+
+    per_claim = [[] for _ in claims]
+    for owner, damage_interval in zip(owners, damage_intervals):
+        per_claim[owner].append(damage_interval)
+
+    claim_intervals = interval(claim_totals) if claims else []
+    return per_claim, claim_intervals
+
+
+def add_cost_intervals(aggregated_report, state=None, samples=DEFAULT_SAMPLES, seed=None):
+    """
+    Add a "cost_interval" to every damaged part and to the summary of an aggregated report.
+
+    Args:
+        aggregated_report: Report from aggregate_reports()
+        state: State used for the labor rate (None draws from all states)
+        samples: Monte Carlo draws per damage
+        seed: Random seed (optional)
+
+    Returns:
+        The claim's cost interval
+    """
+    damaged_parts = aggregated_report.get("damaged_parts", [])
+    if not damaged_parts:
+        return None
+
+    per_damage, per_claim = simulate_claims([{"damaged_parts": damaged_parts, "state": state}],
+                                            samples=samples, seed=seed)
+    for damaged_part, damage_interval in zip(damaged_parts, per_damage[0]):
+        damaged_part["cost_interval"] = damage_interval
+
+    aggregated_report["summary"]["cost_interval"] = per_claim[0]
+    return per_claim[0]
@@ -1,64 +1,122 @@
 '''
 Uses pre-trained models to classify the type, severity, and part of a car that is damaged from a given image.
+Models are loaded once per process and kept resident. Every stage has a predict function that returns the
+label with its scores for a batch of images (paths or PIL images), plus label-only batch and single-image wrappers.
 '''
 
+from functools import lru_cache
+from .model_store import resolve_model
+
+SEVERITY_LABELS = ['Minor', 'Moderate', 'Severe']
+PART_LABELS = ['Door', 'Window', 'Headlight', 'Mirror', 'Body/Unknown', 'Hood', 'Bumper', 'Wind Shield']
+
+
 # From 'https://huggingface.co/beingamit99/car_damage_detection'
 
+@lru_cache(maxsize=None)
+def load_damage_model():
+    from transformers import pipeline
+    return pipeline("image-classification", model=resolve_model("type_of_damage"), device=0, use_fast=True)
+
+
+# Predicts the type of damage with the score of every damage type for a batch of images
+def predict_damage_batch(images, batch_size=8):
+    pipe = load_damage_model()
+    # top_k=None falls back to the pipeline default of 5, the model has 6 damage types
+    results = pipe(list(images), batch_size=batch_size, top_k=pipe.model.config.num_labels)
+
+    predictions = []
+    for result in results:
+        scores = {x['label']: x['score'] for x in result}
+        predictions.append({"label": max(scores, key=scores.get), "scores": scores})
+    return predictions
+
+
+# Classifies the type of damage on the car for a batch of images
+def classify_damage_batch(images, batch_size=8):
+    return [p["label"] for p in predict_damage_batch(images, batch_size)]
+
+
 # Classifies the type of damage on the car
 def classify_damage(image_path):
-    from transformers import pipeline
-    pipe = pipeline("image-classification", model="beingamit99/car_damage_detection", device=0, use_fast=True)
-    result = pipe(image_path)
-    print(f'Results: {result}')
-    best = max(result, key=lambda x: x['score'])
-    return best['label']
+    return classify_damage_batch([image_path])[0]
 
 
 # From 'https://huggingface.co/nezahatkorkmaz/car-damage-level-detection-yolov8'
 
-# Classifies the severity of the damage on the car
-def damage_severity(image_path):
+@lru_cache(maxsize=None)
+def load_severity_model():
     from ultralytics import YOLO
-    from pathlib import Path
+    return YOLO(resolve_model("severity"))
 
-    model_path = Path(__file__).resolve().parent.parent / "models" / "car-damage.pt"
-    model = YOLO(model_path)
-    results = model(image_path)
-    
-    # Extract classification probabilities
-    probs = results[0].probs
-    
-    severity = ['Minor', 'Moderate', 'Severe']
-    
-    return severity[probs.top1]
+
+# Predicts the severity with the probability of every severity level for a batch of images
+def predict_severity_batch(images, batch_size=8):
+    model = load_severity_model()
+    results = model(list(images), batch=batch_size)
+
+    predictions = []
+    for result in results:
+        # Extract classification probabilities
+        probs = result.probs
+        scores = dict(zip(SEVERITY_LABELS, probs.data.cpu().tolist()))
+        predictions.append({"label": SEVERITY_LABELS[probs.top1], "scores": scores})
+    return predictions
+
+
+# Classifies the severity of the damage on the car for a batch of images
+def damage_severity_batch(images, batch_size=8):
+    return [p["label"] for p in predict_severity_batch(images, batch_size)]
+
+
+# Classifies the severity of the damage on the car
+def damage_severity(image_path):
+    return damage_severity_batch([image_path])[0]
     
 
 # From 'https://github.com/suryaremanan/Damaged-Car-parts-prediction-using-YOLOv8' (best.pt)
 
-# Classifies the damaged part of the car
-def classify_part(image_path):
+@lru_cache(maxsize=None)
+def load_part_model():
     from ultralytics import YOLO
-    from pathlib import Path
+    return YOLO(resolve_model("part"))
 
-    model_path = Path(__file__).resolve().parent.parent / "models" / "car-part.pt"
-    model = YOLO(model_path)
-    results = model(image_path)
-    
-    # Extract detected class names
-    detected_parts = results[0].names
-    boxes = results[0].boxes
-    
-    # Return 'unknown' if part cannot be determined
-    if boxes is None or boxes.cls is None or len(boxes.cls) == 0:
-        return "Unknown"
-
-    # If there are detections, get the most confident one
-    classes = boxes.cls.cpu().numpy()
-    confidences = boxes.conf.cpu().numpy()
-    best_idx = confidences.argmax()
-    best_class = int(classes[best_idx])
-    
-    parts = ['Door', 'Window', 'Headlight', 'Mirror', 'Body/Unknown', 'Hood', 'Bumper', 'Wind Shield']
 
-    return parts[best_class]
+# Predicts the damaged part for a batch of images. The score of each part is its most confident box.
+def predict_part_batch(images, batch_size=8):
+    model = load_part_model()
+    results = model(list(images), batch=batch_size)
 
+    predictions = []
+    for result in results:
+        boxes = result.boxes
+
+        # Return 'unknown' if part cannot be determined
+        if boxes is None or boxes.cls is None or len(boxes.cls) == 0:
+            predictions.append({"label": "Unknown", "scores": {}, "boxes": []})
+            continue
+
+        # If there are detections, keep the most confident one per part
+        scores = {}
+        detections = []
+        for cls, conf, xyxy in zip(boxes.cls.cpu().tolist(), boxes.conf.cpu().tolist(),
+                                   boxes.xyxy.cpu().tolist()):
+            part = PART_LABELS[int(cls)]
+            scores[part] = max(scores.get(part, 0.0), conf)
+            detections.append({"part": part, "confidence": conf, "box": xyxy})
+
+        # Boxes are kept most confident first for region-of-interest cropping
+        detections.sort(key=lambda d: d["confidence"], reverse=True)
+        predictions.append({"label": max(scores, key=scores.get), "scores": scores, "boxes": detections})
+
+    return predictions
+
+
+# Classifies the damaged part of the car for a batch of images
+def classify_part_batch(images, batch_size=8):
+    return [p["label"] for p in predict_part_batch(images, batch_size)]
+
+
+# Classifies the damaged part of the car
+def classify_part(image_path):
+    return classify_part_batch([image_path])[0]
@@ -30,6 +30,18 @@ with open("./src/cost_data/part_cost_table.json", "r") as f:
 DEFAULT_LABOR_HOURS = LABOR_TIME_TABLE.get("Default")
 DEFAULT_PART_COST = PART_COST_TABLE.get("Default")
 
+# Part price multipliers by quality tier, relative to the table part cost
+# Format: {tier: (min, estimated, max)}
+PART_TIER_MULTIPLIERS = {
+    "oem": (1.1, 1.3, 1.5),
+    "oem_equivalent": (0.8, 1.0, 1.1),
+    "aftermarket": (0.5, 0.65, 0.8),
+    "used": (0.2, 0.3, 0.4)
+}
+
+# Parts commonly available used from salvage yards
+USED_PARTS = ["Door", "Hood", "Bumper", "Mirror"]
+
 
 def get_labor_hours(part, severity, damage_type):
     """
@@ -0,0 +1,547 @@
+'''
+Headless evaluation harness that replaces the evaluation notebooks.
+Runs a stage's predict function over a labeled folder (one sub-folder per true label, e.g.
+FOLDER/minor/*.jpg) in batches, optionally split across worker processes, and records accuracy,
+per-label precision/recall/F1, the confusion matrix and images/sec together in one JSON result.
+
+Raw predictions are cached per image under outputs/evaluation/cache/, keyed by the image fingerprint,
+the model's manifest entry and the resolution cap, so re-running or combining results does not repeat
+inference. Use --refresh to re-run inference when the inference code itself changed.
+
+Commands (run from the repository root):
+    python -m src.pipeline.evaluation run FOLDER --stage severity [--workers 2]
+    python -m src.pipeline.evaluation run DATASET_DIR                  One sub-folder per stage
+    python -m src.pipeline.evaluation run FOLDER --stage severity --baseline RESULT.json
+    python -m src.pipeline.evaluation combine RESULT.json [RESULT.json ...] --output combined.json
+'''
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import platform
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .output_store import append_jsonl, read_jsonl, atomic_write, new_run_id
+from .checkpoint import image_fingerprint
+from .image_ingest import DEFAULT_MAX_SIDE
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+EVALUATION_DIR = Path("outputs") / "evaluation"
+CACHE_DIRNAME = "cache"
+
+STAGES = ("car", "part", "type_of_damage", "severity")
+SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+DEFAULT_READERS = 4
+# Largest accuracy drop (absolute) a result may show against its baseline
+DEFAULT_MAX_DROP = 0.0
+
+
+def normalize(label):
+    """Compare labels ignoring case, spaces and punctuation (folder names cannot hold '/')"""
+    return re.sub(r"[^a-z0-9]", "", label.lower())
+
+
+def load_labeled_folder(folder):
+    """Return (image paths, true labels) for a folder of label sub-folders"""
+    paths, labels = [], []
+    for label in sorted(os.listdir(folder)):
+        label_dir = os.path.join(folder, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            if name.lower().endswith(SUPPORTED_EXT):
+                paths.append(os.path.join(label_dir, name))
+                labels.append(label)
+    return paths, labels
+
+
+def accuracy(predictions, labels):
+    """Fraction of predictions whose label matches the true label"""
+    correct = sum(normalize(p["label"]) == normalize(label) for p, label in zip(predictions, labels))
+    return correct / len(labels) if labels else 0.0
+
+
+def stage_folders(folder, stages=None):
+    """
+    Find the labeled folder of each stage.
+
+    Args:
+        folder: Labeled folder, or a dataset folder with one labeled sub-folder per stage
+        stages: Stages to evaluate (default: every stage with a sub-folder)
+
+    Returns:
+        Dictionary of {stage: labeled folder}
+    """
+    if stages and len(stages) == 1 and not os.path.isdir(os.path.join(folder, stages[0])):
+        return {stages[0]: folder}
+    return {stage: os.path.join(folder, stage) for stage in stages or STAGES
+            if os.path.isdir(os.path.join(folder, stage))}
+
+
+def model_key(stage, max_side):
+    """
+    Identify the weights and preprocessing a cached prediction was made with.
+
+    Args:
+        stage: Stage name (also the model's name in the manifest)
+        max_side: Resolution cap the images were decoded with
+
+    Returns:
+        Key string
+    """
+    from .model_store import load_manifest
+
+    entry = load_manifest().get(stage, {})
+    return f"{entry.get('sha256') or entry.get('source')}:{entry.get('path')}:{max_side}"
+
+
+def cache_path(stage, folder, output_dir=EVALUATION_DIR):
+    """
+    Get the prediction cache file of a stage and labeled folder.
+
+    Args:
+        stage: Stage name
+        folder: Labeled folder
+        output_dir: Evaluation outputs folder
+
+    Returns:
+        Path of the JSON Lines cache file
+    """
+    folder = str(Path(folder).resolve())
+    digest = hashlib.sha1(folder.encode()).hexdigest()[:16]
+    return Path(output_dir) / CACHE_DIRNAME / f"{stage}-{Path(folder).name}-{digest}.jsonl"
+
+
+def load_cached(path, key):
+    """
+    Load the cached predictions that are still valid.
+
+    Args:
+        path: Cache file from cache_path()
+        key: Current model_key()
+
+    Returns:
+        Dictionary of {image path: {"label", "scores"}}
+    """
+    cached = {}
+    for record in read_jsonl(path):
+        image = record["image"]
+        if record.get("model") != key or not os.path.exists(image):
+            continue
+        if record.get("fingerprint") == image_fingerprint(image):
+            cached[image] = {"label": record["label"], "scores": record["scores"]}
+    return cached
+
+
+def predict_images(stage, paths, cache, key, batch_size=8, max_side=DEFAULT_MAX_SIDE,
+                   readers=DEFAULT_READERS):
+    """
+    Run a stage on images and append each prediction to the cache.
+
+    Args:
+        stage: Stage name from report_generator.STAGE_PREDICTORS
+        paths: Image paths
+        cache: Cache file to append to
+        key: model_key() stored with every prediction
+        batch_size: Images per forward pass
+        max_side: Resolution cap for decoding
+        readers: Threads decoding images in parallel
+
+    Returns:
+        Dictionary of timings: "images", "decode_seconds" and "inference_seconds"
+    """
+    from .report_generator import STAGE_PREDICTORS
+    from .image_ingest import prepare_image
+
+    predict = STAGE_PREDICTORS[stage]
+    os.makedirs(Path(cache).parent, exist_ok=True)
+    timings = {"images": len(paths), "decode_seconds": 0.0, "inference_seconds": 0.0}
+    if not paths:
+        return timings
+
+    with ThreadPoolExecutor(max_workers=max(1, readers)) as pool:
+        # Warm up so model loading is not timed
+        predict([prepare_image(paths[0], max_side)], 1)
+
+        for offset in range(0, len(paths), batch_size):
+            batch = paths[offset:offset + batch_size]
+
+            start = time.perf_counter()
+            images = list(pool.map(lambda path: prepare_image(path, max_side), batch))
+            decoded = time.perf_counter()
+            predictions = predict(images, batch_size)
+            timings["decode_seconds"] += decoded - start
+            timings["inference_seconds"] += time.perf_counter() - decoded
+
+            for path, prediction in zip(batch, predictions):
+                append_jsonl(cache, {"image": path, "fingerprint": image_fingerprint(path), "model": key,
+                                     "label": prediction["label"], "scores": prediction["scores"]})
+
+    return timings
+
+
+def predict_in_workers(stage, paths, cache, key, workers, batch_size=8, max_side=DEFAULT_MAX_SIDE,
+                       readers=DEFAULT_READERS):
+    """
+    Split the images across worker processes that each load the model and append to the cache.
+
+    Args:
+        stage: Stage name
+        paths: Image paths
+        cache: Cache file shared by the workers
+        key: model_key() stored with every prediction
+        workers: Worker processes
+        batch_size: Images per forward pass
+        max_side: Resolution cap for decoding
+        readers: Decoding threads per worker
+
+    Returns:
+        List of timing dictionaries, one per worker that finished
+    """
+    shards = [paths[i::workers] for i in range(workers)]
+    procs = []
+    for index, shard in enumerate(shards):
+        if not shard:
+            continue
+        # Each worker is a fresh process so the runtime profile applies before torch starts
+        proc = subprocess.Popen([sys.executable, "-m", "src.pipeline.evaluation", "predict", stage,
+                                 "--cache", str(Path(cache).resolve()), "--key", key,
+                                 "--worker-index", str(index), "--batch-size", str(batch_size),
+                                 "--max-side", str(max_side), "--readers", str(readers)],
+                                cwd=ROOT_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        proc.stdin.write(json.dumps([os.path.abspath(path) for path in shard]))
+        proc.stdin.close()
+        procs.append(proc)
+
+    timings = []
+    for proc in procs:
+        output = proc.stdout.read()
+        proc.wait()
+        if proc.returncode == 0 and output.strip():
+            timings.append(json.loads(output.strip().splitlines()[-1]))
+        else:
+            print(f"Warning: Evaluation worker exited with status {proc.returncode}")
+    return timings
+
+
+def throughput(timings):
+    """
+    Combine worker timings into images/sec.
+    Workers run concurrently, so their rates add up.
+
+    Args:
+        timings: Timing dictionaries from predict_images()
+
+    Returns:
+        Dictionary with "images", "decode_seconds", "inference_seconds", "images_per_second" and
+        "inference_images_per_second" (rates are None when nothing was inferred)
+    """
+    images = sum(t["images"] for t in timings)
+    result = {
+        "images": images,
+        "decode_seconds": round(sum(t["decode_seconds"] for t in timings), 3),
+        "inference_seconds": round(sum(t["inference_seconds"] for t in timings), 3),
+        "images_per_second": None,
+        "inference_images_per_second": None
+    }
+    if not images:
+        return result
+
+    result["images_per_second"] = round(sum(
+        t["images"] / (t["decode_seconds"] + t["inference_seconds"])
+        for t in timings if t["images"] and t["decode_seconds"] + t["inference_seconds"] > 0), 2)
+    result["inference_images_per_second"] = round(sum(
+        t["images"] / t["inference_seconds"] for t in timings if t["images"] and t["inference_seconds"] > 0), 2)
+    return result
+
+
+def classification_metrics(predictions, labels):
+    """
+    Compute the accuracy, confusion matrix and per-label precision/recall/F1.
+    Predicted labels are matched to the folder names ignoring case and punctuation.
+
+    Args:
+        predictions: Dictionaries with a "label", one per image
+        labels: True label (folder name) per image
+
+    Returns:
+        Metrics dictionary
+    """
+    by_name = {normalize(label): label for label in labels}
+    predicted = [by_name.get(normalize(p["label"]), p["label"]) for p in predictions]
+
+    confusion = {label: {} for label in sorted(set(labels))}
+    for true, pred in zip(labels, predicted):
+        confusion[true][pred] = confusion[true].get(pred, 0) + 1
+
+    per_label = {}
+    for label in confusion:
+        support = sum(confusion[label].values())
+        hits = confusion[label].get(label, 0)
+        predicted_count = sum(row.get(label, 0) for row in confusion.values())
+        precision = hits / predicted_count if predicted_count else 0.0
+        recall = hits / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_label[label] = {"precision": round(precision, 4), "recall": round(recall, 4),
+                            "f1": round(f1, 4), "support": support}
+
+    total = len(labels)
+    averages = {}
+    for name in ("precision", "recall", "f1"):
+        values = [(m[name], m["support"]) for m in per_label.values()]
+        averages[name] = {
+            "macro": round(sum(v for v, _ in values) / len(values), 4) if values else 0.0,
+            "weighted": round(sum(v * s for v, s in values) / total, 4) if total else 0.0
+        }
+
+    return {"accuracy": round(accuracy(predictions, labels), 4), "images": total,
+            "averages": averages, "per_label": per_label, "confusion_matrix": confusion}
+
+
+def evaluate_stage(stage, folder, batch_size=8, workers=1, max_side=DEFAULT_MAX_SIDE,
+                   readers=DEFAULT_READERS, refresh=False, output_dir=EVALUATION_DIR):
+    """
+    Evaluate one stage on a labeled folder, running inference only for images not in the cache.
+
+    Args:
+        stage: Stage name
+        folder: Labeled folder with one sub-folder per true label
+        batch_size: Images per forward pass
+        workers: Worker processes (1 runs in this process)
+        max_side: Resolution cap for decoding
+        readers: Decoding threads per worker
+        refresh: Ignore the cache and run inference on every image
+        output_dir: Evaluation outputs folder
+
+    Returns:
+        Stage result dictionary with the metrics, throughput and cache details
+    """
+    paths, labels = load_labeled_folder(folder)
+    if not paths:
+        raise ValueError(f"No labeled images found in {folder}")
+    paths = [os.path.abspath(path) for path in paths]
+
+    key = model_key(stage, max_side)
+    cache = cache_path(stage, folder, output_dir)
+    cached = {} if refresh else load_cached(cache, key)
+    missing = [path for path in paths if path not in cached]
+
+    if not missing:
+        timings = []
+    elif workers > 1:
+        timings = predict_in_workers(stage, missing, cache, key, workers, batch_size, max_side, readers)
+    else:
+        timings = [predict_images(stage, missing, cache, key, batch_size, max_side, readers)]
+
+    predictions = load_cached(cache, key)
+    failed = [path for path in paths if path not in predictions]
+    if failed:
+        raise RuntimeError(f"{len(failed)} image(s) of {folder} have no prediction, e.g. {failed[0]}")
+
+    result = classification_metrics([predictions[path] for path in paths], labels)
+    result.update({
+        "folder": str(Path(folder).resolve()),
+        "model": key,
+        "cache": str(cache),
+        "cached_images": len(paths) - len(missing),
+        "throughput": throughput(timings)
+    })
+    return result
+
+
+def host_info():
+    """Describe the machine a result was measured on, so throughput from different hosts can be told apart"""
+    info = {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version()
+    }
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+        info["device"] = torch.cuda.get_device_name(0) if torch.cuda.is_available() else "cpu"
+    return info
+
+
+def compare_to_baseline(result, baseline, max_drop=DEFAULT_MAX_DROP):
+    """
+    Check that no stage lost accuracy against a baseline result.
+
+    Args:
+        result: Evaluation result
+        baseline: Earlier evaluation result
+        max_drop: Largest allowed accuracy drop (absolute)
+
+    Returns:
+        List of regression descriptions (empty if every stage held up)
+    """
+    regressions = []
+    for stage, current in result["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+
+        drop = previous["accuracy"] - current["accuracy"]
+        before = previous["throughput"]["images_per_second"]
+        after = current["throughput"]["images_per_second"]
+        speed = f", {before} -> {after} images/sec" if before and after else ""
+        print(f"   {stage}: accuracy {previous['accuracy']:.4f} -> {current['accuracy']:.4f}{speed}")
+
+        if drop > max_drop:
+            regressions.append(f"{stage}: accuracy dropped by {drop:.4f} (allowed {max_drop:.4f})")
+    return regressions
+
+
+def combine_results(results):
+    """
+    Merge evaluation results into one, later results replacing earlier ones for the same stage.
+
+    Args:
+        results: Evaluation result dictionaries
+
+    Returns:
+        Combined result dictionary
+    """
+    combined = {"created": datetime.now().isoformat(timespec="seconds"), "hosts": [], "stages": {}}
+    for result in results:
+        if result.get("host") and result["host"] not in combined["hosts"]:
+            combined["hosts"].append(result["host"])
+        combined["stages"].update(result.get("stages", {}))
+    return combined
+
+
+def save_result(result, output_path):
+    """Write a result JSON atomically"""
+    os.makedirs(Path(output_path).parent, exist_ok=True)
+
+    def write(path):
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+
+    atomic_write(output_path, write)
+
+
+def print_summary(result):
+    """Print one line per stage, like the combined table of the old notebooks"""
+    print(f"\n{'stage':<16}{'images':>8}{'accuracy':>10}{'macro F1':>10}{'weighted F1':>13}{'images/sec':>12}")
+    print("-" * 69)
+    for stage, metrics in result["stages"].items():
+        rate = metrics["throughput"]["images_per_second"]
+        print(f"{stage:<16}{metrics['images']:>8}{metrics['accuracy']:>10.4f}"
+              f"{metrics['averages']['f1']['macro']:>10.4f}{metrics['averages']['f1']['weighted']:>13.4f}"
+              f"{rate if rate is not None else 'cached':>12}")
+
+
+def run(args):
+    """Evaluate the requested stages and write one result JSON"""
+    from .model_store import verify_models
+    from .runtime_profile import ensure_profile
+
+    folders = stage_folders(args.folder, args.stage)
+    if not folders:
+        print(f"Error: No stage folders ({', '.join(STAGES)}) found in {args.folder}")
+        sys.exit(1)
+
+    problems = verify_models(check_hash=False, names=list(folders))
+    if problems:
+        print("Error: Model store check failed")
+        for problem in problems:
+            print(f"   - {problem}")
+        sys.exit(1)
+
+    if args.workers <= 1:
+        ensure_profile()
+
+    result = {"created": datetime.now().isoformat(timespec="seconds"),
+              "settings": {"batch_size": args.batch_size, "workers": args.workers,
+                           "max_side": args.max_side, "readers": args.readers},
+              "stages": {}}
+    for stage, folder in folders.items():
+        print(f"Evaluating {stage} on {folder}")
+        try:
+            result["stages"][stage] = evaluate_stage(stage, folder, args.batch_size, args.workers,
+                                                     args.max_side, args.readers, args.refresh)
+        except (ValueError, RuntimeError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    result["host"] = host_info()
+
+    output = args.output or EVALUATION_DIR / f"result-{new_run_id()}.json"
+    save_result(result, output)
+    print_summary(result)
+    print(f"\nResult saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        print(f"\nCompared to {args.baseline}:")
+        regressions = compare_to_baseline(result, baseline, args.max_drop)
+        if regressions:
+            print("Error: Accuracy regressed")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the models on labeled folders.")
+    parser.add_argument("command", choices=["run", "combine", "predict"])
+    parser.add_argument("folder", nargs="?", help="Labeled folder, or a folder with one labeled sub-folder per stage")
+    parser.add_argument("results", nargs="*", help="Result files to combine")
+    parser.add_argument("--stage", action="append", choices=STAGES,
+                        help="Stage to evaluate, may be repeated (default: every stage sub-folder)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes running inference")
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS, help="Image decoding threads per worker")
+    parser.add_argument("--max-side", type=int, default=DEFAULT_MAX_SIDE,
+                        help=f"Resolution cap for decoding, 0 for full resolution (default: {DEFAULT_MAX_SIDE})")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached predictions")
+    parser.add_argument("--output", help="Result file to write")
+    parser.add_argument("--baseline", help="Earlier result; exit with status 1 if any stage lost accuracy")
+    parser.add_argument("--max-drop", type=float, default=DEFAULT_MAX_DROP,
+                        help=f"Accuracy drop allowed against --baseline (default: {DEFAULT_MAX_DROP})")
+    parser.add_argument("--cache", help=argparse.SUPPRESS)
+    parser.add_argument("--key", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-index", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Internal: one worker of predict_in_workers(), the stage is passed as the folder argument
+    if args.command == "predict":
+        from .runtime_profile import load_profile, apply_profile
+        apply_profile(load_profile(), worker_index=args.worker_index)
+        paths = json.load(sys.stdin)
+        timings = predict_images(args.folder, paths, args.cache, args.key, args.batch_size, args.max_side,
+                                 args.readers)
+        print(json.dumps(timings))
+        return
+
+    if not args.folder:
+        parser.error(f"{args.command} needs a folder" if args.command == "run" else "combine needs result files")
+
+    if args.command == "combine":
+        results = []
+        for path in [args.folder] + args.results:
+            with open(path, "r") as f:
+                results.append(json.load(f))
+        combined = combine_results(results)
+        output = args.output or EVALUATION_DIR / f"combined-{new_run_id()}.json"
+        save_result(combined, output)
+        print_summary(combined)
+        print(f"\nCombined result saved to {output}")
+        return
+
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
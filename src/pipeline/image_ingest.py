@@ -0,0 +1,99 @@
+'''
+Prepares input images before they are sent to the models.
+Large phone photos are decoded at reduced size (JPEG draft mode / DCT scaling), rotated using
+their EXIF orientation and capped to a maximum resolution. A normalized thumbnail can be cached
+next to the input image so later runs skip decoding the full photo.
+'''
+
+import os
+import mmap
+import hashlib
+from pathlib import Path
+
+# The classifiers use 224px inputs and the YOLO models 640px, so a 1280px cap keeps plenty of detail
+DEFAULT_MAX_SIDE = 1280
+
+# Folder created next to the input images when the thumbnail cache is enabled
+CACHE_DIRNAME = ".autoclaim_cache"
+CACHE_JPEG_QUALITY = 95
+
+
+def load_image(image_path, max_side=DEFAULT_MAX_SIDE):
+    """
+    Decode an image at reduced size, apply its EXIF orientation and cap its resolution.
+
+    Args:
+        image_path: Path to the image file
+        max_side: Maximum width/height of the returned image in pixels (None or 0 keeps the full resolution)
+
+    Returns:
+        RGB PIL image no larger than max_side on either side
+    """
+    from PIL import Image, ImageOps
+
+    with open(image_path, "rb") as f:
+        # Memory-map the file so the decoder reads straight from the page cache
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with Image.open(mapped) as img:
+                if max_side:
+                    if img.format == "JPEG":
+                        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale, never below max_side
+                        img.draft("RGB", (max_side, max_side))
+
+                    # Shrink before rotating so the transpose works on the small image
+                    img.thumbnail((max_side, max_side))
+                img = ImageOps.exif_transpose(img)
+                return img.convert("RGB")
+
+
+def get_cache_path(image_path, max_side=DEFAULT_MAX_SIDE):
+    """
+    Get the thumbnail cache path for an image.
+    The key includes file size and modification time, so edited images are re-cached.
+
+    Args:
+        image_path: Path to the original image
+        max_side: Resolution cap the thumbnail was made with
+
+    Returns:
+        Path of the cached thumbnail
+    """
+    image_path = Path(image_path)
+    stat = image_path.stat()
+    key = f"{image_path.name}:{stat.st_size}:{stat.st_mtime_ns}:{max_side}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    return image_path.parent / CACHE_DIRNAME / f"{image_path.stem}-{digest}.jpg"
+
+
+def prepare_image(image_path, max_side=DEFAULT_MAX_SIDE, cache=False):
+    """
+    Load an image for the pipeline, using the thumbnail cache when enabled.
+
+    Args:
+        image_path: Path to the image file
+        max_side: Maximum width/height in pixels (None or 0 keeps the full resolution)
+        cache: Whether to read and write the normalized thumbnail cache
+
+    Returns:
+        RGB PIL image ready to be passed to the models
+    """
+    # Full-resolution images are not worth caching, they are as large as the originals
+    if not cache or not max_side:
+        return load_image(image_path, max_side)
+
+    from PIL import Image
+    from .output_store import atomic_write
+
+    cache_path = get_cache_path(image_path, max_side)
+    if cache_path.exists():
+        with Image.open(cache_path) as cached:
+            return cached.convert("RGB")
+
+    img = load_image(image_path, max_side)
+
+    # Several workers may cache the same image, so write through a temp file
+    os.makedirs(cache_path.parent, exist_ok=True)
+    atomic_write(cache_path, lambda path: img.save(path, format="JPEG", quality=CACHE_JPEG_QUALITY))
+
+    return img
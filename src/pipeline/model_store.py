@@ -0,0 +1,277 @@
+'''
+Local model weight store.
+src/models/manifest.json lists every model with its source, local path, sha256 and format. Models are
+loaded from the local copy when it exists, Hugging Face models are kept as safetensors (memory-mapped,
+zero-copy loading) and a startup check fails fast when a weight file is missing.
+
+Commands (run from the repository root):
+    python -m src.pipeline.model_store prefetch   Download Hugging Face models into src/models/hf/
+    python -m src.pipeline.model_store pack       Convert local Hugging Face models to safetensors
+    python -m src.pipeline.model_store verify     Check that every model exists and matches its sha256
+'''
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
+MODELS_DIR = Path(__file__).resolve().parent.parent / "models"
+MANIFEST_PATH = MODELS_DIR / "manifest.json"
+
+# Set to 1 to never fall back to the Hugging Face hub when a local copy is missing
+OFFLINE_ENV = "AUTOCLAIM_OFFLINE"
+
+HF_FORMAT = "hf-safetensors"
+HF_ALLOW_PATTERNS = ["*.json", "*.safetensors", "*.bin", "*.txt"]
+
+
+class ModelStoreError(Exception):
+    """Raised when a model cannot be found in the local store."""
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Load the model manifest.
+
+    Args:
+        path: Manifest JSON file
+
+    Returns:
+        Dictionary of {model name: entry}
+    """
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """
+    Save the model manifest.
+
+    Args:
+        manifest: Dictionary of {model name: entry}
+        path: Manifest JSON file
+    """
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+
+def is_offline():
+    """Whether hub downloads are disabled through the AUTOCLAIM_OFFLINE environment variable"""
+    return os.environ.get(OFFLINE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def local_path(name, manifest=None):
+    """
+    Get the local path of a model from the manifest.
+
+    Args:
+        name: Model name in the manifest
+        manifest: Loaded manifest (optional)
+
+    Returns:
+        Absolute Path of the local weights (file or folder)
+    """
+    manifest = manifest or load_manifest()
+    if name not in manifest:
+        raise ModelStoreError(f"Model '{name}' is not listed in {MANIFEST_PATH}")
+    return MODELS_DIR / manifest[name]["path"]
+
+
+def resolve_model(name):
+    """
+    Get what to pass to the model loader: the local copy if it exists, otherwise the
+    Hugging Face repo ID (unless running offline).
+
+    Args:
+        name: Model name in the manifest
+
+    Returns:
+        Local path or hub repo ID as a string
+    """
+    manifest = load_manifest()
+    entry = manifest.get(name)
+    path = local_path(name, manifest)
+
+    if path.exists():
+        return str(path)
+
+    if entry["format"] == HF_FORMAT and not is_offline():
+        return entry["source"]
+
+    raise ModelStoreError(f"Weights for model '{name}' not found at {path} "
+                          f"(source: {entry['source']}). Run 'python -m src.pipeline.model_store prefetch'.")
+
+
+def hash_path(path):
+    """
+    Compute the sha256 of a weight file, or of every file in a model folder.
+
+    Args:
+        path: File or folder
+
+    Returns:
+        Hex digest string
+    """
+    path = Path(path)
+    if path.is_file():
+        files = [path]
+    else:
+        # Skip hidden download metadata such as .cache/huggingface
+        files = sorted(p for p in path.rglob("*") if p.is_file()
+                       and not any(part.startswith(".") for part in p.relative_to(path).parts))
+    digest = hashlib.sha256()
+
+    for file in files:
+        if path.is_dir():
+            digest.update(str(file.relative_to(path)).encode())
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def verify_models(check_hash=True, names=None):
+    """
+    Check the local model store against the manifest.
+
+    Args:
+        check_hash: Whether to compare sha256 digests (slower, reads every weight file)
+        names: Models to check (default: all)
+
+    Returns:
+        List of problem descriptions (empty if everything is fine)
+    """
+    manifest = load_manifest()
+    problems = []
+
+    for name in names or manifest:
+        entry = manifest[name]
+        path = local_path(name, manifest)
+
+        if not path.exists():
+            # Hugging Face models can still come from the hub when online
+            if entry["format"] == HF_FORMAT and not is_offline():
+                continue
+            problems.append(f"{name}: missing weights at {path} (source: {entry['source']})")
+            continue
+
+        if check_hash and entry.get("sha256") and hash_path(path) != entry["sha256"]:
+            problems.append(f"{name}: sha256 mismatch for {path}")
+
+    return problems
+
+
+def check_startup(check_hash=False):
+    """
+    Fail fast before any image is processed if a model cannot be loaded.
+
+    Args:
+        check_hash: Whether to verify sha256 digests as well
+
+    Returns:
+        True if every model is available, otherwise prints the problems and returns False
+    """
+    problems = verify_models(check_hash=check_hash)
+    if not problems:
+        return True
+
+    print("Error: Model store check failed")
+    for problem in problems:
+        print(f"   - {problem}")
+    print("Run 'python -m src.pipeline.model_store prefetch' or copy the weights into src/models/.")
+    return False
+
+
+def pack_model(name, manifest):
+    """
+    Convert a local Hugging Face model to safetensors so it loads memory-mapped.
+
+    Args:
+        name: Model name in the manifest
+        manifest: Loaded manifest
+    """
+    from transformers import AutoModelForImageClassification
+
+    path = local_path(name, manifest)
+    if any(path.glob("*.safetensors")):
+        return
+
+    model = AutoModelForImageClassification.from_pretrained(path)
+    model.save_pretrained(path, safe_serialization=True)
+    for old in path.glob("*.bin"):
+        old.unlink()
+
+
+def prefetch(names=None):
+    """
+    Download the Hugging Face models into the local store, pack them and record their sha256.
+
+    Args:
+        names: Models to fetch (default: all)
+    """
+    from huggingface_hub import snapshot_download
+
+    manifest = load_manifest()
+    for name in names or manifest:
+        entry = manifest[name]
+        path = local_path(name, manifest)
+
+        if entry["format"] != HF_FORMAT:
+            if not path.exists():
+                print(f"{name}: download manually from {entry['source']} to {path}")
+            continue
+
+        print(f"{name}: fetching {entry['source']}")
+        snapshot_download(entry["source"], local_dir=path, allow_patterns=HF_ALLOW_PATTERNS)
+        pack_model(name, manifest)
+        entry["sha256"] = hash_path(path)
+
+    save_manifest(manifest)
+
+
+def pack(names=None):
+    """
+    Convert local Hugging Face models to safetensors and update their sha256.
+
+    Args:
+        names: Models to pack (default: all)
+    """
+    manifest = load_manifest()
+    for name in names or manifest:
+        entry = manifest[name]
+        path = local_path(name, manifest)
+        if entry["format"] != HF_FORMAT or not path.exists():
+            continue
+
+        print(f"{name}: packing {path}")
+        pack_model(name, manifest)
+        entry["sha256"] = hash_path(path)
+
+    save_manifest(manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local model weight store.")
+    parser.add_argument("command", choices=["prefetch", "pack", "verify"])
+    parser.add_argument("models", nargs="*", help="Model names from the manifest (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "prefetch":
+        prefetch(args.models)
+    elif args.command == "pack":
+        pack(args.models)
+
+    problems = verify_models(check_hash=True, names=args.models)
+    for problem in problems:
+        print(f"   - {problem}")
+    if problems:
+        sys.exit(1)
+    print("All models OK")
+
+
+if __name__ == "__main__":
+    main()
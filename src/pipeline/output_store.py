@@ -0,0 +1,199 @@
+'''
+Concurrency-safe output layer for saving reports.
+Every run writes into its own directory named by a unique run ID, files are written to a
+temporary file and renamed into place, and each write is appended to an index of runs.
+Creating a file never depends on how many reports are already in the outputs folder.
+'''
+
+import os
+import json
+import uuid
+from pathlib import Path
+from datetime import datetime
+
+# Index of runs and the files they wrote, one JSON record per line
+INDEX_FILENAME = "runs.jsonl"
+
+
+def new_run_id():
+    """
+    Create a unique, sortable run ID (timestamp plus a random suffix).
+
+    Returns:
+        Run ID string, e.g. "20241115-120000-1a2b3c4d"
+    """
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def append_jsonl(path, record):
+    """
+    Append a record to a JSON Lines file.
+
+    The record is written with a single O_APPEND write so that lines from
+    parallel workers are never interleaved.
+
+    Args:
+        path: JSON Lines file to append to (created if missing)
+        record: Dictionary to append
+    """
+    line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def read_jsonl(path):
+    """
+    Read all records of a JSON Lines file.
+    A truncated last line (e.g. from a killed process) is ignored.
+
+    Args:
+        path: JSON Lines file to read
+
+    Returns:
+        List of records (empty if the file does not exist)
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+
+    records = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def append_index(output_dir, record):
+    """
+    Append a record to the run index of an outputs folder.
+
+    Args:
+        output_dir: Outputs folder holding the index
+        record: Dictionary to append
+    """
+    append_jsonl(Path(output_dir) / INDEX_FILENAME, record)
+
+
+def read_index(output_dir="outputs"):
+    """
+    Read the run index of an outputs folder.
+
+    Args:
+        output_dir: Outputs folder holding the index
+
+    Returns:
+        List of index records (empty if there is no index yet)
+    """
+    return read_jsonl(Path(output_dir) / INDEX_FILENAME)
+
+
+def create_run_dir(output_dir="outputs", run_id=None):
+    """
+    Atomically create a new run directory inside the outputs folder.
+
+    Args:
+        output_dir: Outputs folder (default: "outputs")
+        run_id: Run ID to use (optional, a new unique ID is generated if None)
+
+    Returns:
+        Path to the new run directory
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    while True:
+        current_id = run_id or new_run_id()
+        run_dir = Path(output_dir) / current_id
+        try:
+            # mkdir is atomic, so two processes can never share a run directory
+            os.mkdir(run_dir)
+        except FileExistsError:
+            if run_id:
+                raise
+            continue
+
+        append_index(output_dir, {
+            "run_id": current_id,
+            "event": "created",
+            "time": datetime.now().isoformat()
+        })
+        return run_dir
+
+
+def reserve_path(run_dir, filename, extension):
+    """
+    Claim a file name inside a run directory using O_EXCL creation.
+
+    Args:
+        run_dir: Run directory to create the file in
+        filename: Base name of the file, without extension
+        extension: File extension including the dot (e.g. ".json")
+
+    Returns:
+        Path of the reserved (empty) file
+    """
+    counter = 0
+    while True:
+        suffix = f"({counter})" if counter else ""
+        output_path = Path(run_dir) / f"{filename}{suffix}{extension}"
+        try:
+            fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            # Only happens when one run saves the same name twice
+            counter += 1
+            continue
+        os.close(fd)
+        return output_path
+
+
+def atomic_write(output_path, write_func):
+    """
+    Write a file through a temporary file that is renamed into place.
+
+    Args:
+        output_path: Final path of the file
+        write_func: Function that takes a path and writes the file contents to it
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f".{output_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        write_func(tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def save_to_run(run_dir, filename, extension, write_func):
+    """
+    Reserve a file name in a run directory, write it atomically and record it in the index.
+
+    Args:
+        run_dir: Run directory from create_run_dir()
+        filename: Base name of the file, without extension
+        extension: File extension including the dot
+        write_func: Function that takes a path and writes the file contents to it
+
+    Returns:
+        Path of the written file
+    """
+    run_dir = Path(run_dir)
+    output_path = reserve_path(run_dir, filename, extension)
+    atomic_write(output_path, write_func)
+
+    append_index(run_dir.parent, {
+        "run_id": run_dir.name,
+        "event": "file",
+        "file": f"{run_dir.name}/{output_path.name}",
+        "time": datetime.now().isoformat()
+    })
+    return output_path
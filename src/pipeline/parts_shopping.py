@@ -3,8 +3,11 @@ Generates shopping guide for car parts without requiring API keys.
 Uses estimated costs and provides links to online retailers for users to check prices.
 '''
 
+import io
 import json
 from typing import Dict, List
+from .render import render_shopping_guide, GUIDE_FORMATS, DEFAULT_GUIDE_FORMAT
+from .estimate_cost import PART_TIER_MULTIPLIERS, USED_PARTS
 
 # Popular online auto parts retailers
 with open("./src/cost_data/parts_retailer.json", "r") as f:
@@ -15,6 +18,25 @@ with open("./src/cost_data/part_search_terms.json", "r") as f:
     PART_SEARCH_TERMS = json.load(f)
 
 
+def price_range(estimated_cost: float, tier: str) -> Dict:
+    """
+    Get the price range of a part in one quality tier.
+    
+    Args:
+        estimated_cost: Base estimated cost from our tables
+        tier: Quality tier from PART_TIER_MULTIPLIERS
+    
+    Returns:
+        Dictionary with min, max and estimated price
+    """
+    low, estimated, high = PART_TIER_MULTIPLIERS[tier]
+    return {
+        "min": round(estimated_cost * low, 2),
+        "max": round(estimated_cost * high, 2),
+        "estimated": round(estimated_cost * estimated, 2)
+    }
+
+
 def generate_shopping_options(part: str, estimated_cost: float) -> List[Dict]:
     """
     Generate shopping options for a car part without API.
@@ -32,11 +54,7 @@ def generate_shopping_options(part: str, estimated_cost: float) -> List[Dict]:
     options.append({
         "type": "OEM (Original Equipment)",
         "quality": "Highest",
-        "price_range": {
-            "min": round(estimated_cost * 1.1, 2),
-            "max": round(estimated_cost * 1.5, 2),
-            "estimated": round(estimated_cost * 1.3, 2)
-        },
+        "price_range": price_range(estimated_cost, "oem"),
         "warranty": "Manufacturer warranty (typically 12+ months)",
         "source": "Dealership or authorized OEM suppliers",
         "pros": [
@@ -57,11 +75,7 @@ def generate_shopping_options(part: str, estimated_cost: float) -> List[Dict]:
     options.append({
         "type": "OEM Equivalent (Certified Aftermarket)",
         "quality": "High",
-        "price_range": {
-            "min": round(estimated_cost * 0.8, 2),
-            "max": round(estimated_cost * 1.1, 2),
-            "estimated": estimated_cost
-        },
+        "price_range": price_range(estimated_cost, "oem_equivalent"),
         "warranty": "1-2 year warranty",
         "source": "Certified aftermarket brands (CAPA certified)",
         "pros": [
@@ -81,11 +95,7 @@ def generate_shopping_options(part: str, estimated_cost: float) -> List[Dict]:
     options.append({
         "type": "Aftermarket Standard",
         "quality": "Standard",
-        "price_range": {
-            "min": round(estimated_cost * 0.5, 2),
-            "max": round(estimated_cost * 0.8, 2),
-            "estimated": round(estimated_cost * 0.65, 2)
-        },
+        "price_range": price_range(estimated_cost, "aftermarket"),
         "warranty": "90 days - 1 year limited warranty",
         "source": "Budget aftermarket suppliers",
         "pros": [
@@ -103,15 +113,11 @@ def generate_shopping_options(part: str, estimated_cost: float) -> List[Dict]:
     })
     
     # Used / Salvage - Lowest Cost
-    if part in ["Door", "Hood", "Bumper", "Mirror"]:  # Parts commonly available used
+    if part in USED_PARTS:  # Parts commonly available used
         options.append({
             "type": "Used / Salvage Yard",
             "quality": "Variable",
-            "price_range": {
-                "min": round(estimated_cost * 0.2, 2),
-                "max": round(estimated_cost * 0.4, 2),
-                "estimated": round(estimated_cost * 0.3, 2)
-            },
+            "price_range": price_range(estimated_cost, "used"),
             "warranty": "Limited or no warranty (as-is)",
             "source": "Auto salvage yards, Pull-A-Part, LKQ",
             "pros": [
@@ -209,7 +215,7 @@ def create_shopping_guide(part: str, estimated_cost: float, labor_cost: float,
 
 
 def format_shopping_report(shopping_guides: List[Dict], vehicle_info: Dict, 
-                          total_estimates: Dict) -> str:
+                          total_estimates: Dict, fmt: str = DEFAULT_GUIDE_FORMAT) -> str:
     """
     Format a human-readable shopping report.
     
@@ -217,128 +223,41 @@ def format_shopping_report(shopping_guides: List[Dict], vehicle_info: Dict,
         shopping_guides: List of shopping guides for each part
         vehicle_info: Dictionary with year, make, model
         total_estimates: Dictionary with total cost breakdowns
+        fmt: "text", "html" or "markdown"
     
     Returns:
         Formatted string report
     """
-    lines = []
-    lines.append("=" * 80)
-    lines.append(" " * 25 + "AUTO PARTS SHOPPING GUIDE")
-    lines.append("=" * 80)
-    lines.append("")
-    lines.append(f"Vehicle: {vehicle_info['year']} {vehicle_info['make']} {vehicle_info['model']}")
-    lines.append("")
-    lines.append("COST SUMMARY")
-    lines.append("-" * 80)
-    lines.append(f"Total Parts Cost:  ${total_estimates['total_part_cost']:.2f}")
-    lines.append(f"Total Labor Cost:  ${total_estimates['total_labor_cost']:.2f}")
-    lines.append(f"TOTAL ESTIMATE:    ${total_estimates['total_estimated_cost']:.2f}")
-    lines.append("")
-    
-    for i, guide in enumerate(shopping_guides, 1):
-        lines.append("=" * 80)
-        lines.append(f"PART {i}: {guide['part']}")
-        lines.append("=" * 80)
-        lines.append("")
-        lines.append(f"Estimated Cost: ${guide['cost_breakdown']['estimated_part_cost']:.2f} "
-                    f"(Labor: ${guide['cost_breakdown']['estimated_labor_cost']:.2f})")
-        lines.append("")
-        
-        # Shopping Options
-        lines.append("SHOPPING OPTIONS:")
-        lines.append("-" * 80)
-        lines.append("")
-        
-        for j, option in enumerate(guide['shopping_options'], 1):
-            lines.append(f"{j}. {option['type']}")
-            lines.append(f"   Quality Level: {option['quality']}")
-            
-            price_range = option['price_range']
-            lines.append(f"   Price Range: ${price_range['min']:.2f} - ${price_range['max']:.2f}")
-            lines.append(f"   Estimated: ${price_range['estimated']:.2f}")
-            lines.append(f"   Warranty: {option['warranty']}")
-            lines.append(f"   Source: {option['source']}")
-            lines.append(f"   ")
-            lines.append(f"   Pros: {', '.join(option['pros'])}")
-            lines.append(f"   Cons: {', '.join(option['cons'])}")
-            lines.append(f"   ")
-            lines.append(f"   Best For: {option['best_for']}")
-            lines.append("")
-        
-        # Where to Buy
-        lines.append("WHERE TO SHOP ONLINE:")
-        lines.append("-" * 80)
-        lines.append("")
-        
-        for retailer in guide['where_to_buy']:
-            lines.append(f" {retailer['name']}")
-            lines.append(f"   {retailer['url']}")
-            lines.append(f"   Search for: {', '.join(retailer['search_terms'])}")
-            lines.append(f"   Quality tiers: {', '.join(retailer['quality_tiers'])}")
-            lines.append("")
-        
-        lines.append("")
-    
-    # General Tips
-    lines.append("=" * 80)
-    lines.append("SHOPPING TIPS")
-    lines.append("=" * 80)
-    lines.append("")
-    for tip in shopping_guides[0]['tips']:  # Tips are the same for all
-        lines.append(f"- {tip}")
-    lines.append("")
-    
-    # Paint Note
-    lines.append("=" * 80)
-    lines.append("IMPORTANT NOTES")
-    lines.append("=" * 80)
-    lines.append("")
-    lines.append(" PAINTING: Most body parts require professional painting after installation.")
-    lines.append("   Paint costs typically range from $200-$500 per panel depending on:")
-    lines.append("   - Single stage vs. multi-stage paint")
-    lines.append("   - Color matching complexity")
-    lines.append("   - Clear coat and finish quality")
-    lines.append("")
-    lines.append(" INSTALLATION: Labor costs vary by shop and location.")
-    lines.append("   Consider getting quotes from multiple repair shops.")
-    lines.append("")
-    lines.append(" INSURANCE: If filing a claim, check with your insurance about:")
-    lines.append("   - Approved repair shops")
-    lines.append("   - OEM vs aftermarket parts requirements")
-    lines.append("   - Your deductible and coverage limits")
-    lines.append("")
-    lines.append("=" * 80)
-    
-    return "\n".join(lines)
+    buffer = io.StringIO()
+    render_shopping_guide(buffer, shopping_guides, vehicle_info, total_estimates, fmt)
+    return buffer.getvalue()
 
 
 def save_shopping_guide(shopping_guides: List[Dict], vehicle_info: Dict,
-                       total_estimates: Dict, output_dir: str = "outputs"):
+                       total_estimates: Dict, output_dir: str = "outputs", run_dir=None,
+                       fmt: str = DEFAULT_GUIDE_FORMAT):
     """
-    Save shopping guide to a text file.
+    Save shopping guide to a text, HTML or Markdown file.
     
     Args:
         shopping_guides: List of shopping guides
         vehicle_info: Vehicle information
         total_estimates: Total cost estimates
         output_dir: Output directory
+        run_dir: Run directory from create_run_dir() (optional, a new run is created if None)
+        fmt: "text", "html" or "markdown"
     """
-    import os
-    from pathlib import Path
-    
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = Path(output_dir) / "shopping_guide.txt"
+    from .output_store import create_run_dir, save_to_run
     
-    # Create numbered file if exists
-    counter = 1
-    while output_path.exists():
-        output_path = Path(f"{output_dir}/shopping_guide({counter}).txt")
-        counter += 1
+    if run_dir is None:
+        run_dir = create_run_dir(output_dir)
     
-    report = format_shopping_report(shopping_guides, vehicle_info, total_estimates)
+    # Stream the guide into the file section by section
+    def write_guide(path):
+        with open(path, "w", encoding="utf-8") as f:
+            render_shopping_guide(f, shopping_guides, vehicle_info, total_estimates, fmt)
     
-    with open(output_path, "w") as f:
-        f.write(report)
+    output_path = save_to_run(run_dir, "shopping_guide", GUIDE_FORMATS[fmt], write_guide)
     
     print(f"\n💡 Shopping guide saved to: {output_path.resolve()}")
     return output_path
@@ -0,0 +1,368 @@
+'''
+Template-based rendering of the shopping guide and the console summaries.
+Templates use {field} style placeholders (see compile_template) and are compiled once at import
+into f-string functions. Renderers write section by section to an open file handle (or sys.stdout),
+so a claim with hundreds of parts is never held in memory as one string.
+The shopping guide can be rendered as text, HTML or Markdown.
+'''
+
+import sys
+import html
+from string import Formatter
+
+# Shopping guide formats and their file extensions
+GUIDE_FORMATS = {
+    "text": ".txt",
+    "html": ".html",
+    "markdown": ".md"
+}
+DEFAULT_GUIDE_FORMAT = "text"
+
+RULE = "=" * 80
+DASH = "-" * 80
+CONSOLE_RULE = "=" * 70
+CONSOLE_DASH = "-" * 70
+
+
+def compile_template(template, escape=None):
+    """
+    Compile a template into a function that renders a context dictionary.
+
+    Placeholders are {field}, {field.key} for nested dictionaries, {field:spec} and {field!j},
+    which joins a list with ", ". {index} is the position passed as the second argument.
+
+    Args:
+        template: Template text
+        escape: Function applied to fields without a format spec (e.g. HTML escaping)
+
+    Returns:
+        Function called as render(context, index=None) that returns the rendered string
+    """
+    pieces = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        if literal:
+            pieces.append(repr(literal))
+        if field is None:
+            continue
+
+        keys = field.split(".")
+        if not all(key.isidentifier() for key in keys) or "{" in (spec or ""):
+            raise ValueError(f"Unsupported template field '{{{field}}}'")
+
+        value = "index" if field == "index" else "_c" + "".join(f'["{key}"]' for key in keys)
+        if conversion == "j":
+            value, conversion = f'", ".join({value})', None
+        if escape and not spec:
+            value = f"_e({value})"
+        pieces.append("f'{" + value + (f"!{conversion}" if conversion else "")
+                      + (f":{spec}" if spec else "") + "}'")
+
+    code = "lambda _c, index=None: " + (" ".join(pieces) or "''")
+    return eval(compile(code, "<template>", "eval"), {"_e": escape or str})
+
+
+def compile_templates(templates, escape=None):
+    """Compile every template of a set, see compile_template()"""
+    return {name: compile_template(template, escape) for name, template in templates.items()}
+
+
+# Shopping guide, one template per section
+
+TEXT_GUIDE = {
+    "header": (
+        f"{RULE}\n{' ' * 25}AUTO PARTS SHOPPING GUIDE\n{RULE}\n\n"
+        "Vehicle: {year} {make} {model}\n\n"
+        f"COST SUMMARY\n{DASH}\n"
+        "Total Parts Cost:  ${total_part_cost:.2f}\n"
+        "Total Labor Cost:  ${total_labor_cost:.2f}\n"
+        "TOTAL ESTIMATE:    ${total_estimated_cost:.2f}\n\n"
+    ),
+    "part": (
+        f"{RULE}\n" "PART {index}: {part}\n" f"{RULE}\n\n"
+        "Estimated Cost: ${cost_breakdown.estimated_part_cost:.2f} "
+        "(Labor: ${cost_breakdown.estimated_labor_cost:.2f})\n\n"
+        f"SHOPPING OPTIONS:\n{DASH}\n\n"
+    ),
+    "option": (
+        "{index}. {type}\n"
+        "   Quality Level: {quality}\n"
+        "   Price Range: ${price_range.min:.2f} - ${price_range.max:.2f}\n"
+        "   Estimated: ${price_range.estimated:.2f}\n"
+        "   Warranty: {warranty}\n"
+        "   Source: {source}\n"
+        "   \n"
+        "   Pros: {pros!j}\n"
+        "   Cons: {cons!j}\n"
+        "   \n"
+        "   Best For: {best_for}\n\n"
+    ),
+    "retailers": f"WHERE TO SHOP ONLINE:\n{DASH}\n\n",
+    "retailer": (
+        " {name}\n"
+        "   {url}\n"
+        "   Search for: {search_terms!j}\n"
+        "   Quality tiers: {quality_tiers!j}\n\n"
+    ),
+    "part_end": "\n",
+    "tips": f"{RULE}\nSHOPPING TIPS\n{RULE}\n\n",
+    "tip": "- {tip}\n",
+    "footer": (
+        f"\n{RULE}\nIMPORTANT NOTES\n{RULE}\n\n"
+        " PAINTING: Most body parts require professional painting after installation.\n"
+        "   Paint costs typically range from $200-$500 per panel depending on:\n"
+        "   - Single stage vs. multi-stage paint\n"
+        "   - Color matching complexity\n"
+        "   - Clear coat and finish quality\n\n"
+        " INSTALLATION: Labor costs vary by shop and location.\n"
+        "   Consider getting quotes from multiple repair shops.\n\n"
+        " INSURANCE: If filing a claim, check with your insurance about:\n"
+        "   - Approved repair shops\n"
+        "   - OEM vs aftermarket parts requirements\n"
+        "   - Your deductible and coverage limits\n\n"
+        f"{RULE}"  # no trailing newline, as in the guide files written before the renderer
+    )
+}
+
+HTML_GUIDE = {
+    "header": (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        "<title>Auto Parts Shopping Guide - {year} {make} {model}</title>\n"
+        "<style>body{{font-family:sans-serif;max-width:60em;margin:auto}}"
+        "table{{border-collapse:collapse}}td,th{{padding:2px 12px;text-align:left}}</style>\n"
+        "</head>\n<body>\n<h1>Auto Parts Shopping Guide</h1>\n"
+        "<p>Vehicle: {year} {make} {model}</p>\n"
+        "<h2>Cost Summary</h2>\n<table>\n"
+        "<tr><th>Total Parts Cost</th><td>${total_part_cost:.2f}</td></tr>\n"
+        "<tr><th>Total Labor Cost</th><td>${total_labor_cost:.2f}</td></tr>\n"
+        "<tr><th>Total Estimate</th><td><b>${total_estimated_cost:.2f}</b></td></tr>\n"
+        "</table>\n"
+    ),
+    "part": (
+        "<h2>Part {index}: {part}</h2>\n"
+        "<p>Estimated Cost: ${cost_breakdown.estimated_part_cost:.2f} "
+        "(Labor: ${cost_breakdown.estimated_labor_cost:.2f})</p>\n"
+        "<h3>Shopping Options</h3>\n"
+    ),
+    "option": (
+        "<h4>{index}. {type}</h4>\n<ul>\n"
+        "<li>Quality Level: {quality}</li>\n"
+        "<li>Price Range: ${price_range.min:.2f} - ${price_range.max:.2f}</li>\n"
+        "<li>Estimated: ${price_range.estimated:.2f}</li>\n"
+        "<li>Warranty: {warranty}</li>\n"
+        "<li>Source: {source}</li>\n"
+        "<li>Pros: {pros!j}</li>\n"
+        "<li>Cons: {cons!j}</li>\n"
+        "<li>Best For: {best_for}</li>\n</ul>\n"
+    ),
+    "retailers": "<h3>Where to Shop Online</h3>\n<ul>\n",
+    "retailer": (
+        "<li><a href=\"{url}\">{name}</a><br>"
+        "Search for: {search_terms!j}<br>Quality tiers: {quality_tiers!j}</li>\n"
+    ),
+    "part_end": "</ul>\n",
+    "tips": "<h2>Shopping Tips</h2>\n<ul>\n",
+    "tip": "<li>{tip}</li>\n",
+    "footer": (
+        "</ul>\n<h2>Important Notes</h2>\n"
+        "<p><b>Painting:</b> Most body parts require professional painting after installation. "
+        "Paint costs typically range from $200-$500 per panel depending on single stage vs. multi-stage "
+        "paint, color matching complexity and clear coat and finish quality.</p>\n"
+        "<p><b>Installation:</b> Labor costs vary by shop and location. "
+        "Consider getting quotes from multiple repair shops.</p>\n"
+        "<p><b>Insurance:</b> If filing a claim, check with your insurance about approved repair shops, "
+        "OEM vs aftermarket parts requirements and your deductible and coverage limits.</p>\n"
+        "</body>\n</html>\n"
+    )
+}
+
+MARKDOWN_GUIDE = {
+    "header": (
+        "# Auto Parts Shopping Guide\n\n"
+        "**Vehicle:** {year} {make} {model}\n\n"
+        "## Cost Summary\n\n"
+        "| | Cost |\n|---|---:|\n"
+        "| Total Parts Cost | ${total_part_cost:.2f} |\n"
+        "| Total Labor Cost | ${total_labor_cost:.2f} |\n"
+        "| **Total Estimate** | **${total_estimated_cost:.2f}** |\n\n"
+    ),
+    "part": (
+        "## Part {index}: {part}\n\n"
+        "Estimated Cost: ${cost_breakdown.estimated_part_cost:.2f} "
+        "(Labor: ${cost_breakdown.estimated_labor_cost:.2f})\n\n"
+        "### Shopping Options\n\n"
+    ),
+    "option": (
+        "#### {index}. {type}\n\n"
+        "- Quality Level: {quality}\n"
+        "- Price Range: ${price_range.min:.2f} - ${price_range.max:.2f}\n"
+        "- Estimated: ${price_range.estimated:.2f}\n"
+        "- Warranty: {warranty}\n"
+        "- Source: {source}\n"
+        "- Pros: {pros!j}\n"
+        "- Cons: {cons!j}\n"
+        "- Best For: {best_for}\n\n"
+    ),
+    "retailers": "### Where to Shop Online\n\n",
+    "retailer": (
+        "- [{name}]({url})  \n"
+        "  Search for: {search_terms!j}  \n"
+        "  Quality tiers: {quality_tiers!j}\n"
+    ),
+    "part_end": "\n",
+    "tips": "## Shopping Tips\n\n",
+    "tip": "- {tip}\n",
+    "footer": (
+        "\n## Important Notes\n\n"
+        "- **Painting:** Most body parts require professional painting after installation. "
+        "Paint costs typically range from $200-$500 per panel depending on:\n"
+        "  - Single stage vs. multi-stage paint\n"
+        "  - Color matching complexity\n"
+        "  - Clear coat and finish quality\n"
+        "- **Installation:** Labor costs vary by shop and location. "
+        "Consider getting quotes from multiple repair shops.\n"
+        "- **Insurance:** If filing a claim, check with your insurance about:\n"
+        "  - Approved repair shops\n"
+        "  - OEM vs aftermarket parts requirements\n"
+        "  - Your deductible and coverage limits\n"
+    )
+}
+
+GUIDE_TEMPLATES = {
+    "text": compile_templates(TEXT_GUIDE),
+    "html": compile_templates(HTML_GUIDE, escape=lambda value: html.escape(str(value))),
+    "markdown": compile_templates(MARKDOWN_GUIDE)
+}
+
+
+# Console output
+
+SUMMARY_TEMPLATES = compile_templates({
+    "header": (
+        f"DAMAGE ASSESSMENT SUMMARY\n{CONSOLE_DASH}\n"
+        "Vehicle: {year} {make} {model}\n"
+        "\nTotal Damages Found: {total_damages}\n"
+    ),
+    "review": "Needing Review:      {damages_needing_review}\n",
+    "totals": (
+        "Total Part Cost:     ${total_part_cost:.2f}\n"
+        "Total Labor Hours:   {total_labor_hours:.2f} hrs\n"
+        "Total Labor Cost:    ${total_labor_cost:.2f}\n"
+        "\nTOTAL ESTIMATE:      ${total_estimated_cost:.2f}\n"
+    ),
+    "interval": "Likely Range:        ${p10:.2f} - ${p90:.2f} (median ${p50:.2f})\n",
+    "damages": f"{CONSOLE_DASH}\n\nDAMAGES DETECTED:\n",
+    "damage": "\n{index}. {part}\n   Type: {type_of_damage} | Severity: {severity}\n",
+    "confidence": (
+        "   Confidence: part {part:.2f} | type {type_of_damage:.2f} | severity {severity:.2f}{review}\n"
+    ),
+    "cost": "   Cost: ${estimated_cost:.2f} (Parts: ${part_cost:.2f} + Labor: ${labor_cost:.2f})\n",
+    "damage_interval": "   Likely range: ${p10:.2f} - ${p90:.2f}\n"
+})
+
+NEXT_STEPS_TEMPLATES = compile_templates({
+    "header": f"\n{CONSOLE_RULE}\nNEXT STEPS\n{CONSOLE_RULE}\n",
+    "shopping": (
+        "\n1. Review reports:\n"
+        "   • Complete breakdown: {report_output}\n"
+        "   • Shopping guide only: {guide_output}\n"
+        "2. Check shopping guide for parts pricing options\n"
+        "3. Visit online retailers to compare actual prices:\n"
+        "   • RockAuto.com - Huge selection, competitive prices\n"
+        "   • PartsGeek.com - Free shipping over $99\n"
+        "   • CarParts.com - 90-day returns\n"
+        "   • 1AAuto.com - Video installation guides\n"
+        "4. Get quotes from local repair shops for labor\n"
+        "5. Consider part quality vs. vehicle age/value\n"
+    ),
+    "plain": (
+        "\n1. Review reports:\n"
+        "   • Complete breakdown: {report_output}\n"
+        "   • Shopping guide only: {guide_output}\n"
+        "2. Get quotes from local repair shops\n"
+        "3. Run again with shopping guide for parts pricing info\n"
+    )
+})
+
+
+def render_shopping_guide(stream, shopping_guides, vehicle_info, total_estimates, fmt=DEFAULT_GUIDE_FORMAT):
+    """
+    Render the shopping guide of a claim, writing each section as soon as it is rendered.
+
+    Args:
+        stream: Open text file handle
+        shopping_guides: List of shopping guides for each part
+        vehicle_info: Dictionary with year, make, model
+        total_estimates: Dictionary with total cost breakdowns
+        fmt: One of GUIDE_FORMATS
+    """
+    if fmt not in GUIDE_TEMPLATES:
+        raise ValueError(f"Unknown guide format '{fmt}'. Choose from: {', '.join(GUIDE_FORMATS)}")
+
+    templates = GUIDE_TEMPLATES[fmt]
+    write = stream.write
+    write(templates["header"](dict(vehicle_info, **total_estimates)))
+
+    part_template = templates["part"]
+    option_template = templates["option"]
+    retailer_template = templates["retailer"]
+    for i, guide in enumerate(shopping_guides, 1):
+        write(part_template(guide, i))
+        for j, option in enumerate(guide["shopping_options"], 1):
+            write(option_template(option, j))
+
+        write(templates["retailers"]({}))
+        for retailer in guide["where_to_buy"]:
+            write(retailer_template(retailer))
+        write(templates["part_end"]({}))
+
+    # Tips are the same for all parts
+    write(templates["tips"]({}))
+    tip_template = templates["tip"]
+    for tip in shopping_guides[0]["tips"] if shopping_guides else []:
+        write(tip_template({"tip": tip}))
+    write(templates["footer"]({}))
+
+
+def render_summary(aggregated_report, stream=None):
+    """
+    Render the damage assessment summary of an aggregated report.
+
+    Args:
+        aggregated_report: Report from aggregate_reports()
+        stream: Open text file handle (default: sys.stdout)
+    """
+    write = (stream or sys.stdout).write
+    summary = aggregated_report["summary"]
+
+    write(SUMMARY_TEMPLATES["header"](dict(aggregated_report["vehicle"], **summary)))
+    if summary.get("damages_needing_review"):
+        write(SUMMARY_TEMPLATES["review"](summary))
+    write(SUMMARY_TEMPLATES["totals"](summary))
+    if "cost_interval" in summary:
+        write(SUMMARY_TEMPLATES["interval"](summary["cost_interval"]))
+    write(SUMMARY_TEMPLATES["damages"]({}))
+
+    for i, part in enumerate(aggregated_report["damaged_parts"], 1):
+        write(SUMMARY_TEMPLATES["damage"](part, i))
+        if "confidence" in part:
+            review = "  (NEEDS REVIEW)" if part.get("needs_review") else ""
+            write(SUMMARY_TEMPLATES["confidence"](dict(part["confidence"], review=review)))
+        write(SUMMARY_TEMPLATES["cost"](part))
+        if "cost_interval" in part:
+            write(SUMMARY_TEMPLATES["damage_interval"](part["cost_interval"]))
+
+
+def render_next_steps(include_shopping, report_output, guide_output, stream=None):
+    """
+    Render the next steps shown after a run.
+
+    Args:
+        include_shopping: Whether a shopping guide was included
+        report_output: Path to the complete report
+        guide_output: Path to the shopping guide
+        stream: Open text file handle (default: sys.stdout)
+    """
+    write = (stream or sys.stdout).write
+    context = {"report_output": report_output, "guide_output": guide_output}
+    write(NEXT_STEPS_TEMPLATES["header"](context))
+    write(NEXT_STEPS_TEMPLATES["shopping" if include_shopping else "plain"](context))
@@ -3,13 +3,19 @@ Generates a report of the estimated costs based off of aggregated data from the
 Includes shopping guide without requiring API keys.
 '''
 
-import json
-import os
-from pathlib import Path
 from datetime import datetime
-from .detect_damage import classify_damage, damage_severity, classify_part
-from .car_classification import classify_car
+from .detect_damage import predict_damage_batch, predict_severity_batch, predict_part_batch
+from .car_classification import predict_car_batch, split_make_and_model
 from .estimate_cost import estimate_repair_cost
+from .report_writers import get_writer, DEFAULT_FORMAT
+from .output_store import create_run_dir, save_to_run
+from .image_ingest import prepare_image, DEFAULT_MAX_SIDE
+from .checkpoint import run_with_timeout
+from .runtime_profile import ensure_profile
+from .confidence import (finalize_prediction, apply_tta, calibrate_scores, fitted_stages,
+                         DEFAULT_TTA_THRESHOLD, REVIEW_THRESHOLD)
+from .roi import build_regions, merge_regions
+from .render import render_summary, render_next_steps, DEFAULT_GUIDE_FORMAT
 
 # Import shopping guide functionality
 try:
@@ -18,8 +24,18 @@ try:
 except ImportError:
     SHOPPING_AVAILABLE = False
 
+# Model stages run for every image, in order
+STAGE_PREDICTORS = {
+    "car": predict_car_batch,
+    "part": predict_part_batch,
+    "type_of_damage": predict_damage_batch,
+    "severity": predict_severity_batch
+}
 
-def generate_report(image_path, car_year, state=None, include_shopping=True):
+
+def generate_report(image_path, car_year, state=None, include_shopping=True,
+                    max_side=DEFAULT_MAX_SIDE, thumbnail_cache=False, stage_timeout=None,
+                    tta_budget=None, tta_threshold=DEFAULT_TTA_THRESHOLD, roi_mode=None):
     """
     Generate a damage report for a single image.
     
@@ -28,18 +44,172 @@ def generate_report(image_path, car_year, state=None, include_shopping=True):
         car_year: Year of the vehicle
         state: State for labor rate calculation (optional)
         include_shopping: Whether to include shopping guide info
+        max_side: Resolution cap for the decoded image (None sends the full-size file to the models)
+        thumbnail_cache: Whether to cache the downscaled image next to the input
+        stage_timeout: Seconds each model stage may take before StageTimeout is raised (optional)
+        tta_budget: Claim budget from confidence.new_budget() to enable adaptive TTA (optional)
+        tta_threshold: Confidence below which TTA views are run
+        roi_mode: Crop the part detector's "best" box or "all" boxes for the damage models (optional)
     
     Returns:
         Dictionary containing the damage report
     """
+    job = {
+        "image_path": image_path,
+        "car_year": car_year,
+        "state": state,
+        "include_shopping": include_shopping,
+        "tta_budget": tta_budget
+    }
+    return generate_reports([job], batch_size=1, max_side=max_side, thumbnail_cache=thumbnail_cache,
+                            stage_timeout=stage_timeout, tta_threshold=tta_threshold,
+                            roi_mode=roi_mode)[0]
+
+
+def run_stage(stage, images, budgets, batch_size=8, stage_timeout=None, tta_threshold=DEFAULT_TTA_THRESHOLD):
+    """
+    Run one model stage over a batch of images, with temperature-scaled confidences and adaptive TTA.
+    
+    Args:
+        stage: Stage name from STAGE_PREDICTORS
+        images: Images to run the stage on
+        budgets: TTA budget per image (None entries disable TTA for that image)
+        batch_size: Images per forward pass
+        stage_timeout: Seconds the stage may take before StageTimeout is raised (optional)
+        tta_threshold: Confidence below which TTA views are run
+    
+    Returns:
+        List of finalized predictions, one per image
+    """
+    predict = STAGE_PREDICTORS[stage]
+    predictions = run_with_timeout(predict, images, batch_size, timeout=stage_timeout)
+    for prediction in predictions:
+        finalize_prediction(prediction, stage)
+    
+    # Only low-confidence images of claims with budget left get extra views
+    if any(budget is not None for budget in budgets):
+        run_with_timeout(apply_tta, predictions, images, predict, stage, budgets,
+                         tta_threshold, batch_size, timeout=stage_timeout)
+    return predictions
+
+
+def generate_reports(jobs, batch_size=8, max_side=DEFAULT_MAX_SIDE, thumbnail_cache=False,
+                     stage_timeout=None, tta_threshold=DEFAULT_TTA_THRESHOLD, roi_mode=None):
+    """
+    Generate damage reports for many images at once, running each model over the whole batch.
+    The images may belong to different vehicles.
+    
+    Args:
+        jobs: List of dictionaries with "image_path", "car_year", "state", "include_shopping"
+              and optionally a "tta_budget" shared by the images of one claim and an already
+              decoded "image"
+        batch_size: Images per forward pass of each model
+        max_side: Resolution cap for the decoded images (None sends the full-size files to the models)
+        thumbnail_cache: Whether to cache the downscaled images next to the inputs
+        stage_timeout: Seconds each model stage may take for the batch before StageTimeout is raised
+        tta_threshold: Confidence below which TTA views are run for jobs with a budget
+        roi_mode: "best" or "all" to feed crops of the part detector's boxes to the damage type
+                  and severity models instead of the full frame (optional). In "all" mode every
+                  extra part becomes an entry of the report's "additional_damage" list; boxes of
+                  the same part are priced once, as the most severe of them.
+    
+    Returns:
+        List of damage reports in the same order as jobs
+    """
+    # Thread settings must be in place before the first model loads
+    ensure_profile()
+    
+    # Decode the images once at reduced size instead of once per model at full size
+    images = []
+    for job in jobs:
+        if "image" in job:
+            images.append(job["image"])
+        elif max_side:
+            images.append(prepare_image(job["image_path"], max_side, cache=thumbnail_cache))
+        else:
+            images.append(job["image_path"])
+    
+    budgets = [job.get("tta_budget") for job in jobs]
+    options = {"batch_size": batch_size, "stage_timeout": stage_timeout, "tta_threshold": tta_threshold}
+    
+    cars = run_stage("car", images, budgets, **options)
+    parts = run_stage("part", images, budgets, **options)
+    
+    # The damage models see either the full frames or the crops around the detected parts
+    if roi_mode:
+        regions = build_regions(images, parts, roi_mode)
+    else:
+        regions = [{"owner": i, "image": image, "part": parts[i]["label"], "part_confidence": None, "box": None}
+                   for i, image in enumerate(images)]
+    region_images = [region["image"] for region in regions]
+    region_budgets = [budgets[region["owner"]] for region in regions]
+    
+    damage_types = run_stage("type_of_damage", region_images, region_budgets, **options)
+    severities = run_stage("severity", region_images, region_budgets, **options)
+    
+    # Price one region per part (the most severe box), the first part of an image is its main damaged part
+    region_reports = [[] for _ in jobs]
+    for region, damage_type, severity, merged in merge_regions(regions, damage_types, severities):
+        i = region["owner"]
+        job = jobs[i]
+        make, model = split_make_and_model(cars[i]["label"])
+        
+        part_confidence = parts[i]["confidence"]
+        if region["part_confidence"] is not None:
+            part_confidence = calibrate_scores({region["part"]: region["part_confidence"]}, "part")[region["part"]]
+        
+        confidence = {
+            "car": round(cars[i]["confidence"], 4),
+            "part": round(part_confidence, 4),
+            "type_of_damage": round(damage_type["confidence"], 4),
+            "severity": round(severity["confidence"], 4)
+        }
+        probabilities = {
+            stage: {label: round(p, 4) for label, p in prediction["calibrated"].items()}
+            for stage, prediction in (("type_of_damage", damage_type), ("severity", severity))
+        }
+        
+        report = build_report(make, model, region["part"], damage_type["label"], severity["label"],
+                              job["car_year"], job.get("state"), job.get("include_shopping", True),
+                              confidence=confidence, probabilities=probabilities)
+        if region["box"] is not None:
+            report["damaged_part"]["region"] = region["box"]
+        if merged:
+            report["damaged_part"]["merged_regions"] = [
+                {"box": other["box"], "type_of_damage": other_type["label"], "severity": other_severity["label"]}
+                for other, other_type, other_severity in merged
+            ]
+        region_reports[i].append(report)
+    
+    reports = []
+    for image_reports in region_reports:
+        report = image_reports[0]
+        if len(image_reports) > 1:
+            report["additional_damage"] = image_reports[1:]
+        reports.append(report)
+    return reports
+
+
+def build_report(make, model, damaged_part, type_of_damage, damaged_severity,
+                 car_year, state=None, include_shopping=True, confidence=None, probabilities=None):
+    """
+    Build the report for one image from the model predictions.
     
-    # Get vehicle information
-    make, model = classify_car(image_path)
+    Args:
+        make: Vehicle make
+        model: Vehicle model
+        damaged_part: Damaged part
+        type_of_damage: Type of damage
+        damaged_severity: Damage severity
+        car_year: Year of the vehicle
+        state: State for labor rate calculation (optional)
+        include_shopping: Whether to include shopping guide info
+        confidence: Confidence per stage, temperature scaled for fitted stages (optional)
+        probabilities: Damage type and severity probabilities (optional)
     
-    # Get damage information
-    damaged_part = classify_part(image_path)
-    type_of_damage = classify_damage(image_path)
-    damaged_severity = damage_severity(image_path)
+    Returns:
+        Dictionary containing the damage report
+    """
     
     # Estimate costs based on detected damage
     cost_estimate = estimate_repair_cost(
@@ -67,6 +237,16 @@ def generate_report(image_path, car_year, state=None, include_shopping=True):
         }
     }
     
+    # Keep the confidences so low-confidence estimates can be sent for a human look
+    if confidence is not None:
+        report["damaged_part"]["confidence"] = confidence
+        # Only stages with a fitted temperature are calibrated, the others are raw model scores
+        fitted = fitted_stages()
+        report["damaged_part"]["calibrated_stages"] = [stage for stage in confidence if stage in fitted]
+        report["damaged_part"]["needs_review"] = min(confidence.values()) < REVIEW_THRESHOLD
+    if probabilities is not None:
+        report["damaged_part"]["probabilities"] = probabilities
+    
     # Add shopping guide if requested and available
     if include_shopping and SHOPPING_AVAILABLE:
         shopping_guide = create_shopping_guide(
@@ -107,18 +287,20 @@ def aggregate_reports(reports):
     total_labor_hours = 0
     shopping_guides = []
     
-    for report in reports:
-        part_info = report.get("damaged_part", {})
-        if part_info:
-            damaged_parts.append(part_info)
-            total_part_cost += part_info.get("part_cost", 0)
-            total_labor_cost += part_info.get("labor_cost", 0)
-            total_labor_hours += part_info.get("labor_hours", 0)
-            total_cost += part_info.get("estimated_cost", 0)
-        
-        # Collect shopping guides
-        if "shopping_guide" in report:
-            shopping_guides.append(report["shopping_guide"])
+    for image_report in reports:
+        # An image can hold several damaged parts when ROI mode "all" was used
+        for report in [image_report] + image_report.get("additional_damage", []):
+            part_info = report.get("damaged_part", {})
+            if part_info:
+                damaged_parts.append(part_info)
+                total_part_cost += part_info.get("part_cost", 0)
+                total_labor_cost += part_info.get("labor_cost", 0)
+                total_labor_hours += part_info.get("labor_hours", 0)
+                total_cost += part_info.get("estimated_cost", 0)
+            
+            # Collect shopping guides
+            if "shopping_guide" in report:
+                shopping_guides.append(report["shopping_guide"])
 
     aggregated_report = {
         "vehicle": vehicle_info,
@@ -126,6 +308,7 @@ def aggregate_reports(reports):
         "damaged_parts": damaged_parts,
         "summary": {
             "total_damages": len(damaged_parts),
+            "damages_needing_review": sum(1 for p in damaged_parts if p.get("needs_review")),
             "total_part_cost": round(total_part_cost, 2),
             "total_labor_hours": round(total_labor_hours, 2),
             "total_labor_cost": round(total_labor_cost, 2),
@@ -141,38 +324,39 @@ def aggregate_reports(reports):
         return [aggregated_report, None]
 
 
-def save_report(report, output_dir="outputs", filename="report"):
+def save_report(report, output_dir="outputs", filename="report", fmt=DEFAULT_FORMAT, run_dir=None):
     """
-    Save the aggregated report to a JSON file in the outputs folder.
+    Save the aggregated report to a file in the run's folder under outputs.
     
     Args:
         report: The report dictionary to save
         output_dir: Directory to save the report (default: "outputs")
+        filename: Base name of the file, without extension
+        fmt: Output format, one of "json", "compact", "jsonl" or "parquet" (default: "json")
+        run_dir: Run directory from create_run_dir() (optional, a new run is created if None)
     """
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = Path(output_dir) / f"{filename}.json"
+    extension, writer, _ = get_writer(fmt)
 
-    # Creates a new report file if one already exists (does not overwrite)
-    counter = 1    
-    while output_path.exists():
-        output_path = Path(f"{output_dir}/{filename}({counter}).json")
-        counter += 1
+    # Each run has its own directory, so existing reports are never overwritten
+    if run_dir is None:
+        run_dir = create_run_dir(output_dir)
 
-    # Save aggregated report to outputs folder
-    with open(output_path, "w") as f:
-        json.dump(report, f, indent=4)
+    output_path = save_to_run(run_dir, filename, extension,
+                              lambda path: writer(report, path))
 
     print(f"\nReport saved to: {output_path.resolve()}")
     return output_path
 
 
-def save_shopping_guide_text(report, output_dir="outputs"):
+def save_shopping_guide_text(report, output_dir="outputs", run_dir=None, fmt=DEFAULT_GUIDE_FORMAT):
     """
-    Save a human-readable shopping guide text file.
+    Save a human-readable shopping guide file.
     
     Args:
         report: The aggregated report with shopping guides
         output_dir: Directory to save the guide
+        run_dir: Run directory from create_run_dir() (optional)
+        fmt: Guide format, one of "text", "html" or "markdown" (default: "text")
     """
     if not SHOPPING_AVAILABLE or "shopping_guides" not in report:
         return None
@@ -183,12 +367,51 @@ def save_shopping_guide_text(report, output_dir="outputs"):
         shopping_guides=report["shopping_guides"],
         vehicle_info=report["vehicle"],
         total_estimates=report["summary"],
-        output_dir=output_dir
+        output_dir=output_dir,
+        run_dir=run_dir,
+        fmt=fmt
     )
     
     return output_path
 
 
+def save_all_reports(aggregated_report, shopping_guides=None, run_dir=None,
+                     formats=(DEFAULT_FORMAT,), output_dir="outputs", guide_formats=(DEFAULT_GUIDE_FORMAT,)):
+    """
+    Save every output file of one run: the report, the shopping guides and the readable shopping guide.
+    
+    Args:
+        aggregated_report: Aggregated report from aggregate_reports()
+        shopping_guides: Shopping guides from aggregate_reports() (optional)
+        run_dir: Run directory from create_run_dir() (optional, a new run is created if None)
+        formats: Report formats to save, the first one is returned
+        output_dir: Outputs folder used when a new run is created
+        guide_formats: Readable shopping guide formats ("text", "html", "markdown"), the first one is returned
+    
+    Returns:
+        Tuple of (report path, shopping guide path or None, readable shopping guide path or None)
+    """
+    if run_dir is None:
+        run_dir = create_run_dir(output_dir)
+    
+    report_outputs = [save_report(aggregated_report, filename="report", fmt=fmt, run_dir=run_dir)
+                      for fmt in formats]
+    
+    if not shopping_guides:
+        return report_outputs[0], None, None
+    
+    # Shopping guides are nested per part, so row-only formats (parquet) are skipped
+    json_guide_formats = [fmt for fmt in formats if not get_writer(fmt)[2]] or [DEFAULT_FORMAT]
+    shopping_outputs = [save_report(shopping_guides, filename="shopping_guide", fmt=fmt, run_dir=run_dir)
+                        for fmt in json_guide_formats]
+    
+    complete_report = dict(aggregated_report, shopping_guides=shopping_guides)
+    text_outputs = [save_shopping_guide_text(complete_report, run_dir=run_dir, fmt=fmt)
+                    for fmt in guide_formats]
+    
+    return report_outputs[0], shopping_outputs[0], text_outputs[0]
+
+
 def print_report_summary(aggregated_report):
     """
     Prints a formatted summary of a vehicle damage assessment report.
@@ -204,28 +427,7 @@ def print_report_summary(aggregated_report):
         print("Error: Aggregated report is empty.")
         return
     
-    # Print summary to console
-    print("DAMAGE ASSESSMENT SUMMARY")
-    print("-" * 70)
-    print(f"Vehicle: {aggregated_report['vehicle']['year']} "
-          f"{aggregated_report['vehicle']['make']} "
-          f"{aggregated_report['vehicle']['model']}")
-    print(f"\nTotal Damages Found: {aggregated_report['summary']['total_damages']}")
-    print(f"Total Part Cost:     ${aggregated_report['summary']['total_part_cost']:.2f}")
-    print(f"Total Labor Hours:   {aggregated_report['summary']['total_labor_hours']:.2f} hrs")
-    print(f"Total Labor Cost:    ${aggregated_report['summary']['total_labor_cost']:.2f}")
-    print(f"\nTOTAL ESTIMATE:      ${aggregated_report['summary']['total_estimated_cost']:.2f}")
-    print("-" * 70)
-    
-    # Show damage details
-    print("\nDAMAGES DETECTED:")
-    for i, part in enumerate(aggregated_report['damaged_parts'], 1):
-        print(f"\n{i}. {part['part']}")
-        print(f"   Type: {part['type_of_damage']} | Severity: {part['severity']}")
-        print(f"   Cost: ${part['estimated_cost']:.2f} "
-              f"(Parts: ${part['part_cost']:.2f} + Labor: ${part['labor_cost']:.2f})")
-        
-    return
+    render_summary(aggregated_report)
 
 
 def print_next_steps(include_shopping, json_output, shopping_output="No shopping guide generated"):
@@ -235,30 +437,6 @@ def print_next_steps(include_shopping, json_output, shopping_output="No shopping
     Args:
         include_shopping: Whether shopping guide was included
         json_output: Path to complete report
-        parts_output: Path to parts report
-        labor_output: Path to labor report
+        shopping_output: Path to the shopping guide
     """
-    print(f"\n{'='*70}")
-    print("NEXT STEPS")
-    print("="*70)
-    
-    if include_shopping:
-        print(f"\n1. Review reports:")
-        print(f"   • Complete breakdown: {json_output}")
-        print(f"   • Shopping guide only: {shopping_output}")
-        print(f"2. Check shopping guide for parts pricing options")
-        print(f"3. Visit online retailers to compare actual prices:")
-        print(f"   • RockAuto.com - Huge selection, competitive prices")
-        print(f"   • PartsGeek.com - Free shipping over $99")
-        print(f"   • CarParts.com - 90-day returns")
-        print(f"   • 1AAuto.com - Video installation guides")
-        print(f"4. Get quotes from local repair shops for labor")
-        print(f"5. Consider part quality vs. vehicle age/value")
-    else:
-        print(f"\n1. Review reports:")
-        print(f"   • Complete breakdown: {json_output}")
-        print(f"   • Shopping guide only: {shopping_output}")
-        print(f"2. Get quotes from local repair shops")
-        print(f"3. Run again with shopping guide for parts pricing info")
-    
-    return
\ No newline at end of file
+    render_next_steps(include_shopping, json_output, shopping_output)
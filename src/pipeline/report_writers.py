@@ -0,0 +1,136 @@
+'''
+Writers for saving reports in different output formats.
+Indented JSON stays the default; JSON Lines, compact JSON and Parquet are meant for batch
+pipelines that feed a claims warehouse. The report schema is the same in every format.
+'''
+
+import json
+
+# orjson is optional, compact JSON falls back to the standard library without it
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def write_json(report, output_path):
+    """
+    Write a report as indented JSON (the original output format).
+
+    Args:
+        report: Report dictionary or list to save
+        output_path: Path of the file to write
+    """
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=4)
+
+
+def write_compact_json(report, output_path):
+    """
+    Write a report as compact JSON, using orjson when it is installed.
+
+    Args:
+        report: Report dictionary or list to save
+        output_path: Path of the file to write
+    """
+    if ORJSON_AVAILABLE:
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(report))
+    else:
+        with open(output_path, "w") as f:
+            json.dump(report, f, separators=(",", ":"))
+
+
+def write_jsonl(report, output_path):
+    """
+    Write a report as JSON Lines. A list (e.g. shopping guides) is written one
+    element per line, a single report is written as one line.
+
+    Args:
+        report: Report dictionary or list to save
+        output_path: Path of the file to write
+    """
+    records = report if isinstance(report, list) else [report]
+
+    with open(output_path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")))
+            f.write("\n")
+
+
+def damaged_part_rows(report):
+    """
+    Flatten an aggregated report into one row per damaged part.
+
+    Args:
+        report: Aggregated report from aggregate_reports()
+
+    Returns:
+        List of row dictionaries with the vehicle and timestamp repeated on every row
+    """
+    if not isinstance(report, dict) or "damaged_parts" not in report:
+        raise ValueError("Row-based formats need an aggregated report with 'damaged_parts'")
+
+    vehicle = report.get("vehicle", {})
+    rows = []
+    for part in report["damaged_parts"]:
+        row = {
+            "make": vehicle.get("make"),
+            "model": vehicle.get("model"),
+            "year": vehicle.get("year"),
+            "timestamp": report.get("timestamp"),
+        }
+        row.update(part)
+        rows.append(row)
+
+    return rows
+
+
+def write_parquet(report, output_path):
+    """
+    Write the damaged parts of an aggregated report as a Parquet table.
+
+    Args:
+        report: Aggregated report from aggregate_reports()
+        output_path: Path of the file to write
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    rows = damaged_part_rows(report)
+
+    # from_pylist takes its columns from the first row, so give every row all optional keys (e.g. "region")
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.Table.from_pylist([{key: row.get(key) for key in columns} for row in rows])
+    pq.write_table(table, output_path)
+
+
+# Format name -> (file extension, writer, whether the format only holds damaged part rows)
+REPORT_WRITERS = {
+    "json": (".json", write_json, False),
+    "compact": (".min.json", write_compact_json, False),
+    "jsonl": (".jsonl", write_jsonl, False),
+    "parquet": (".parquet", write_parquet, True),
+}
+
+DEFAULT_FORMAT = "json"
+
+
+def get_writer(fmt):
+    """
+    Look up the extension and writer function for an output format.
+
+    Args:
+        fmt: Format name (one of REPORT_WRITERS)
+
+    Returns:
+        Tuple of (extension, writer function, rows only flag)
+    """
+    if fmt not in REPORT_WRITERS:
+        raise ValueError(f"Unknown report format '{fmt}'. "
+                         f"Choose from: {', '.join(REPORT_WRITERS)}")
+    return REPORT_WRITERS[fmt]
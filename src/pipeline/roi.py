@@ -0,0 +1,118 @@
+'''
+Region-of-interest cropping from the part detector's boxes.
+The damage type and severity models then see a tight crop around the damaged part instead of the
+whole photo, which keeps the resolution on the damage rather than the background.
+'''
+
+from .detect_damage import SEVERITY_LABELS
+
+ROI_MODES = ("best", "all")
+
+# Context kept around each box, as a fraction of the box size
+ROI_PADDING = 0.15
+
+# Boxes smaller than this (in pixels, per side) are too small to classify and are skipped
+MIN_REGION_SIZE = 32
+
+# Upper limit of regions per image in "all" mode
+MAX_REGIONS = 5
+
+
+def crop_region(image, box, padding=ROI_PADDING):
+    """
+    Crop a padded box out of an image.
+
+    Args:
+        image: PIL image or image path
+        box: [x1, y1, x2, y2] in image pixels
+        padding: Context kept around the box as a fraction of its size
+
+    Returns:
+        Cropped PIL image
+    """
+    from PIL import Image
+
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as img:
+            image = img.convert("RGB")
+
+    x1, y1, x2, y2 = box
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    width, height = image.size
+
+    return image.crop((int(max(0, x1 - pad_x)), int(max(0, y1 - pad_y)),
+                       int(min(width, x2 + pad_x)), int(min(height, y2 + pad_y))))
+
+
+def build_regions(images, part_predictions, mode="best"):
+    """
+    Turn part detections into the regions fed to the damage type and severity models.
+    Images without a usable box fall back to the full frame.
+
+    Args:
+        images: Images the part detector ran on
+        part_predictions: Predictions from predict_part_batch (with "boxes")
+        mode: "best" for the most confident box per image, "all" for every box
+
+    Returns:
+        List of region dictionaries with "owner" (image index), "image", "part",
+        "part_confidence" and "box" (None for the full frame)
+    """
+    if mode not in ROI_MODES:
+        raise ValueError(f"Unknown ROI mode '{mode}'. Choose from: {', '.join(ROI_MODES)}")
+
+    regions = []
+    for index, (image, prediction) in enumerate(zip(images, part_predictions)):
+        boxes = [d for d in prediction.get("boxes", [])
+                 if d["box"][2] - d["box"][0] >= MIN_REGION_SIZE and d["box"][3] - d["box"][1] >= MIN_REGION_SIZE]
+        boxes = boxes[:1] if mode == "best" else boxes[:MAX_REGIONS]
+
+        if not boxes:
+            regions.append({"owner": index, "image": image, "part": prediction["label"],
+                            "part_confidence": None, "box": None})
+            continue
+
+        for detection in boxes:
+            regions.append({
+                "owner": index,
+                "image": crop_region(image, detection["box"]),
+                "part": detection["part"],
+                "part_confidence": detection["confidence"],
+                "box": [round(v, 1) for v in detection["box"]]
+            })
+
+    return regions
+
+
+def merge_regions(regions, damage_types, severities):
+    """
+    Keep one priced region per part of each image. When several boxes of an image show the same part,
+    the most severe one is kept (then the most confident) and the others are attached to it, so a part
+    is never priced twice.
+
+    Args:
+        regions: Regions from build_regions()
+        damage_types: Finalized damage type prediction per region
+        severities: Finalized severity prediction per region
+
+    Returns:
+        List of (region, damage type, severity, merged) tuples in the order the parts first appear,
+        where merged lists the (region, damage type, severity) tuples of the other boxes
+    """
+    rank = {label.lower(): i for i, label in enumerate(SEVERITY_LABELS)}
+    parts = {}
+
+    for region, damage_type, severity in zip(regions, damage_types, severities):
+        key = (region["owner"], region["part"])
+        candidate = (region, damage_type, severity)
+        score = (rank.get(severity["label"].lower(), -1), severity["confidence"])
+
+        if key not in parts:
+            parts[key] = [candidate, score, []]
+        elif score > parts[key][1]:
+            parts[key][2].append(parts[key][0])
+            parts[key][0], parts[key][1] = candidate, score
+        else:
+            parts[key][2].append(candidate)
+
+    return [(*kept, merged) for kept, _, merged in parts.values()]
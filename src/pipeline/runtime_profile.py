@@ -0,0 +1,308 @@
+'''
+Thread and allocator tuning for running several pipelines on one CPU host.
+A runtime profile sets the torch intra/inter-op threads, the OpenMP/MKL/OpenBLAS thread counts, the
+glibc malloc arena limit and optionally pins each worker to its own CPUs. It has to be applied before
+the models are loaded. The autotune command sweeps thread settings on a folder of benchmark images
+with several concurrent workers and writes the best profile for the host.
+
+Commands (run from the repository root):
+    python -m src.pipeline.runtime_profile autotune IMAGE_DIR [--workers 2]
+    python -m src.pipeline.runtime_profile show
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+import subprocess
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+PROFILE_PATH = ROOT_DIR / "runtime_profile.json"
+
+# Index of this pipeline among the ones sharing the host, used for CPU pinning (main.py --worker-index)
+WORKER_INDEX_ENV = "AUTOCLAIM_WORKER_INDEX"
+
+# Environment variables read by the OpenMP / BLAS runtimes when torch is imported
+THREAD_ENV_VARS = {
+    "omp_threads": ["OMP_NUM_THREADS"],
+    "mkl_threads": ["MKL_NUM_THREADS"],
+    "blas_threads": ["OPENBLAS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+}
+
+# mallopt() parameter number of M_ARENA_MAX in glibc
+M_ARENA_MAX = -8
+
+SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".bmp")
+
+_applied = False
+
+
+def load_profile(path=PROFILE_PATH):
+    """
+    Load a runtime profile.
+
+    Args:
+        path: Profile JSON file
+
+    Returns:
+        Profile dictionary (empty if the file does not exist)
+    """
+    if not Path(path).exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_profile(profile, path=PROFILE_PATH):
+    """
+    Save a runtime profile.
+
+    Args:
+        profile: Profile dictionary
+        path: Profile JSON file
+    """
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+
+
+def worker_cpus(worker_index, threads):
+    """
+    Get the CPUs a worker is pinned to: consecutive blocks of `threads` CPUs, wrapping around.
+
+    Args:
+        worker_index: Index of the worker (0, 1, ...)
+        threads: CPUs per worker
+
+    Returns:
+        Set of CPU ids
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    start = (worker_index * threads) % len(cpus)
+    return {cpus[(start + i) % len(cpus)] for i in range(min(threads, len(cpus)))}
+
+
+def set_malloc_arena_max(arenas):
+    """
+    Limit the number of glibc malloc arenas, which otherwise grows with every thread.
+
+    Args:
+        arenas: Maximum number of arenas
+
+    Returns:
+        True if the limit was applied (glibc only)
+    """
+    try:
+        import ctypes
+        libc = ctypes.CDLL("libc.so.6")
+        return bool(libc.mallopt(M_ARENA_MAX, int(arenas)))
+    except (OSError, AttributeError):
+        return False
+
+
+def apply_profile(profile, worker_index=None):
+    """
+    Apply a runtime profile to the current process.
+
+    Args:
+        profile: Profile dictionary with any of "intra_op_threads", "inter_op_threads",
+                 "omp_threads", "mkl_threads", "blas_threads", "malloc_arena_max" and "pin_workers"
+        worker_index: Index of this worker, used to pick its CPUs when "pin_workers" is set
+                      (default: the AUTOCLAIM_WORKER_INDEX environment variable)
+
+    Returns:
+        Dictionary of the settings that were applied
+    """
+    global _applied
+    _applied = True
+    applied = {}
+
+    if not profile:
+        return applied
+
+    if worker_index is None and os.environ.get(WORKER_INDEX_ENV, "").isdigit():
+        worker_index = int(os.environ[WORKER_INDEX_ENV])
+    if profile.get("pin_workers") and worker_index is None:
+        print(f"Warning: runtime profile pins workers but no worker index was given "
+              f"(--worker-index or {WORKER_INDEX_ENV}), CPUs are not pinned")
+
+    if "torch" in sys.modules:
+        print("Warning: runtime profile applied after torch was imported, "
+              "OpenMP/MKL settings may not take effect")
+
+    intra = profile.get("intra_op_threads")
+    for key, env_vars in THREAD_ENV_VARS.items():
+        value = profile.get(key, intra)
+        if value:
+            for env_var in env_vars:
+                os.environ[env_var] = str(value)
+            applied[key] = value
+
+    if profile.get("malloc_arena_max") and set_malloc_arena_max(profile["malloc_arena_max"]):
+        applied["malloc_arena_max"] = profile["malloc_arena_max"]
+
+    if profile.get("pin_workers") and worker_index is not None and hasattr(os, "sched_setaffinity"):
+        cpus = worker_cpus(worker_index, intra or 1)
+        os.sched_setaffinity(0, cpus)
+        applied["cpu_affinity"] = sorted(cpus)
+
+    if importlib.util.find_spec("torch") is not None:
+        import torch
+        if intra:
+            torch.set_num_threads(int(intra))
+            applied["intra_op_threads"] = intra
+        if profile.get("inter_op_threads"):
+            try:
+                torch.set_num_interop_threads(int(profile["inter_op_threads"]))
+                applied["inter_op_threads"] = profile["inter_op_threads"]
+            except RuntimeError:
+                # Can only be set once, before any inter-op parallel work has started
+                print("Warning: inter-op threads were already set for this process")
+
+    return applied
+
+
+def ensure_profile(path=PROFILE_PATH):
+    """
+    Apply the host's saved profile once per process, unless a profile was already applied.
+
+    Args:
+        path: Profile JSON file
+    """
+    if not _applied:
+        apply_profile(load_profile(path))
+
+
+def measure(image_dir, batch_size, max_images):
+    """
+    Time the full pipeline on a folder of images in the current process.
+
+    Args:
+        image_dir: Folder of benchmark images
+        batch_size: Images per inference batch
+        max_images: Maximum images to use
+
+    Returns:
+        Images per second
+    """
+    os.chdir(ROOT_DIR)  # cost tables are loaded relative to the repository root
+    sys.path.insert(0, str(ROOT_DIR))
+    from src.pipeline.report_generator import generate_reports
+
+    images = [os.path.join(image_dir, f) for f in sorted(os.listdir(image_dir))
+              if f.lower().endswith(SUPPORTED_EXT)][:max_images]
+    jobs = [{"image_path": image, "car_year": "2020", "state": None, "include_shopping": False}
+            for image in images]
+
+    # Warm up so model loading is not timed
+    generate_reports(jobs[:1], batch_size=1)
+
+    start = time.perf_counter()
+    generate_reports(jobs, batch_size=batch_size)
+    return len(jobs) / (time.perf_counter() - start)
+
+
+def candidate_profiles(workers):
+    """
+    Build the thread settings to sweep for a number of concurrent workers.
+
+    Args:
+        workers: Pipelines that will share the host
+
+    Returns:
+        List of profile dictionaries
+    """
+    per_worker = max(1, os.cpu_count() // workers)
+    thread_counts = sorted({1, 2, 4, 8, 16, per_worker} & set(range(1, per_worker + 1)))
+
+    profiles = []
+    for intra in thread_counts:
+        for inter in (1, 2):
+            for pin in (False, True):
+                profiles.append({
+                    "intra_op_threads": intra,
+                    "inter_op_threads": inter,
+                    "malloc_arena_max": 2,
+                    "pin_workers": pin
+                })
+    return profiles
+
+
+def autotune(image_dir, workers=1, batch_size=8, max_images=16, path=PROFILE_PATH):
+    """
+    Sweep thread settings with concurrent worker processes and save the fastest profile.
+
+    Args:
+        image_dir: Folder of benchmark images
+        workers: Pipelines that will run concurrently on the host
+        batch_size: Images per inference batch
+        max_images: Images per worker and candidate
+        path: Where to write the best profile
+
+    Returns:
+        The best profile
+    """
+    best, best_rate = None, 0.0
+    print(f"Sweeping thread settings for {workers} concurrent worker(s)\n")
+    print(f"{'intra':>6}{'inter':>6}{'pinned':>8}{'images/sec':>12}")
+    print("-" * 32)
+
+    for profile in candidate_profiles(workers):
+        # Each worker is a fresh process so thread settings apply before torch starts
+        procs = [subprocess.Popen([sys.executable, "-m", "src.pipeline.runtime_profile", "measure",
+                                   image_dir, "--profile-json", json.dumps(profile),
+                                   "--worker-index", str(i), "--batch-size", str(batch_size),
+                                   "--max-images", str(max_images)],
+                                  cwd=ROOT_DIR, stdout=subprocess.PIPE, text=True)
+                 for i in range(workers)]
+
+        rates = []
+        for proc in procs:
+            output, _ = proc.communicate()
+            if proc.returncode == 0:
+                rates.append(float(output.strip().splitlines()[-1]))
+        rate = sum(rates) if len(rates) == workers else 0.0
+
+        print(f"{profile['intra_op_threads']:>6}{profile['inter_op_threads']:>6}"
+              f"{'yes' if profile['pin_workers'] else 'no':>8}{rate:>12.2f}")
+        if rate > best_rate:
+            best, best_rate = profile, rate
+
+    if best is None:
+        print("\nError: No candidate finished, profile not written")
+        return None
+
+    best = dict(best, workers=workers, images_per_second=round(best_rate, 2))
+    save_profile(best, path)
+    print(f"\nBest: {best_rate:.2f} images/sec, saved to {path}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune thread and allocator settings for this host.")
+    parser.add_argument("command", choices=["autotune", "show", "measure"])
+    parser.add_argument("image_dir", nargs="?", help="Folder of benchmark images")
+    parser.add_argument("--workers", type=int, default=1, help="Pipelines that will share the host")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-images", type=int, default=16)
+    parser.add_argument("--profile", default=str(PROFILE_PATH), help="Profile file to write or show")
+    parser.add_argument("--profile-json", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-index", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(json.dumps(load_profile(args.profile), indent=2))
+    elif args.command == "measure":
+        apply_profile(json.loads(args.profile_json), worker_index=args.worker_index)
+        print(measure(args.image_dir, args.batch_size, args.max_images))
+    else:
+        if not args.image_dir:
+            parser.error("autotune needs a folder of benchmark images")
+        autotune(args.image_dir, args.workers, args.batch_size, args.max_images, args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+'''
+Warm model pool: a local daemon that keeps all four models loaded between runs.
+The daemon imports torch, loads the weights once and then pre-forks worker processes that share the
+loaded models copy-on-write. Workers accept jobs over a Unix domain socket, so a client run skips the
+import and weight loading time and gets its first report after one forward pass.
+
+Messages are one JSON object per line in each direction. Run `python main.py --daemon` to process a
+folder through the pool.
+
+Commands (run from the repository root):
+    python -m src.pipeline.warm_pool start [--workers 2]   Start the daemon in the foreground
+    python -m src.pipeline.warm_pool status                Show the daemon's workers
+    python -m src.pipeline.warm_pool stop                  Stop the daemon
+'''
+
+import os
+import sys
+import json
+import errno
+import time
+import signal
+import socket
+import argparse
+import traceback
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Override with the AUTOCLAIM_SOCKET environment variable
+SOCKET_ENV = "AUTOCLAIM_SOCKET"
+SOCKET_PATH = ROOT_DIR / "autoclaim.sock"
+
+DEFAULT_WORKERS = 2
+CONNECT_TIMEOUT = 2.0
+
+
+class WarmPoolError(Exception):
+    """Raised when the daemon cannot be reached or a request fails."""
+
+
+def socket_path(path=None):
+    """Get the daemon's socket path: the argument, then AUTOCLAIM_SOCKET, then autoclaim.sock in the repository"""
+    return str(path or os.environ.get(SOCKET_ENV) or SOCKET_PATH)
+
+
+def send_message(stream, message):
+    """Write one JSON message line to a socket file"""
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+
+
+def read_message(stream):
+    """Read one JSON message line from a socket file (None when the peer closed the connection)"""
+    line = stream.readline()
+    return json.loads(line) if line else None
+
+
+def request(message, path=None, timeout=None):
+    """
+    Send one request to the daemon and wait for the reply.
+
+    Args:
+        message: Request dictionary with a "command"
+        path: Socket path (optional)
+        timeout: Seconds to wait for the reply (None waits as long as the jobs take)
+
+    Returns:
+        Reply dictionary
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CONNECT_TIMEOUT)
+        client.connect(socket_path(path))
+        client.settimeout(timeout)
+        with client.makefile("rwb") as stream:
+            send_message(stream, message)
+            reply = read_message(stream)
+    except OSError as e:
+        raise WarmPoolError(f"Warm pool daemon not reachable at {socket_path(path)} ({e}). "
+                            f"Start it with 'python -m src.pipeline.warm_pool start'.")
+    finally:
+        client.close()
+
+    if reply is None:
+        raise WarmPoolError("Warm pool daemon closed the connection")
+    if not reply.get("ok"):
+        raise WarmPoolError(reply.get("error", "Request failed"))
+    return reply
+
+
+def is_running(path=None):
+    """
+    Whether a daemon is listening on the socket.
+    Only the connection is checked, so a daemon whose workers are all busy with long claims still counts.
+
+    Args:
+        path: Socket path (optional)
+
+    Returns:
+        True if a daemon is listening
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(CONNECT_TIMEOUT)
+    try:
+        client.connect(socket_path(path))
+        return True
+    except socket.timeout:
+        return True  # the accept backlog is full, every worker is busy
+    except OSError as e:
+        return e.errno == errno.EAGAIN  # same, on a non-blocking connect
+    finally:
+        client.close()
+
+
+def submit(jobs, path=None, **options):
+    """
+    Generate reports for jobs in the daemon.
+
+    Args:
+        jobs: Job dictionaries as for report_generator.generate_reports() with absolute image paths
+        path: Socket path (optional)
+        **options: batch_size, tta_budget (extra forward passes for this request) and the
+                   keyword arguments of generate_reports()
+
+    Returns:
+        Tuple of (reports in job order with None for images that failed, TTA passes used)
+    """
+    reply = request({"command": "reports", "jobs": jobs, "options": options}, path)
+    return reply["reports"], reply["tta_used"]
+
+
+def preload_models():
+    """Import the model libraries and load all four models into this process"""
+    from .car_classification import load_car_model
+    from .detect_damage import load_damage_model, load_severity_model, load_part_model
+
+    for loader in (load_car_model, load_damage_model, load_severity_model, load_part_model):
+        loader()
+
+
+def set_torch_threads(count):
+    """Set torch's intra-op thread count and return the previous one"""
+    import torch
+
+    previous = torch.get_num_threads()
+    torch.set_num_threads(count)
+    return previous
+
+
+def warm_up():
+    """Run one small image through every stage so the first real job does not pay for lazy initialization"""
+    from PIL import Image
+    from .report_generator import generate_reports
+
+    image = Image.new("RGB", (224, 224), (128, 128, 128))
+    generate_reports([{"image_path": "warm-up", "image": image, "car_year": "2020",
+                       "state": None, "include_shopping": False}], batch_size=1)
+
+
+def run_request(message, state):
+    """
+    Handle one request inside a worker.
+
+    Args:
+        message: Request dictionary
+        state: Worker state dictionary (index, start time, jobs served)
+
+    Returns:
+        Reply dictionary
+    """
+    from .batch import run_jobs
+    from .confidence import new_budget
+
+    command = message.get("command")
+    if command == "status":
+        return {"ok": True, "pid": os.getpid(), "worker": state["index"], "parent": os.getppid(),
+                "uptime_seconds": round(time.time() - state["started"], 1), "images_served": state["served"]}
+
+    if command == "shutdown":
+        state["shutdown"] = True
+        return {"ok": True}
+
+    if command != "reports":
+        return {"ok": False, "error": f"Unknown command '{command}'"}
+
+    options = dict(message.get("options") or {})
+    batch_size = options.pop("batch_size", 8)
+    tta_budget = options.pop("tta_budget", None)
+
+    # One TTA budget shared by all images of the request, as for a claim
+    jobs = message["jobs"]
+    budget = new_budget(tta_budget) if tta_budget is not None else None
+    for job in jobs:
+        job["tta_budget"] = budget
+
+    reports = []
+    for offset in range(0, len(jobs), batch_size):
+        reports.extend(run_jobs(jobs[offset:offset + batch_size], batch_size, **options))
+    state["served"] += len(jobs)
+    return {"ok": True, "reports": reports, "tta_used": budget["used"] if budget else 0}
+
+
+def serve(listener, index):
+    """
+    Accept connections and answer requests until a shutdown request arrives.
+
+    Args:
+        listener: Bound and listening Unix socket shared by all workers
+        index: Worker index
+    """
+    state = {"index": index, "started": time.time(), "served": 0, "shutdown": False}
+
+    while not state["shutdown"]:
+        connection, _ = listener.accept()
+        with connection, connection.makefile("rwb") as stream:
+            while not state["shutdown"]:
+                try:
+                    message = read_message(stream)
+                except (OSError, ValueError):
+                    break
+                if message is None:
+                    break
+
+                try:
+                    reply = run_request(message, state)
+                except Exception as e:
+                    traceback.print_exc()
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+                try:
+                    send_message(stream, reply)
+                except OSError:
+                    break
+
+    # Stop the whole pool, the parent terminates the other workers
+    if os.getppid() != 1 and index is not None:
+        os.kill(os.getppid(), signal.SIGTERM)
+
+
+def start_worker(listener, index, profile, threads):
+    """
+    Fork one worker that shares the parent's loaded models.
+
+    Args:
+        listener: Listening socket
+        index: Worker index, used for CPU pinning
+        profile: Runtime profile dictionary
+        threads: Intra-op threads for the worker's forward passes
+
+    Returns:
+        Child process ID
+    """
+    from .runtime_profile import worker_cpus
+
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Child: Ctrl-C goes to the parent, which stops every worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    code = 0
+    try:
+        # The environment settings were applied before the fork, CPU pinning and torch threads are per worker
+        if profile.get("pin_workers") and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, worker_cpus(index, profile.get("intra_op_threads") or 1))
+        # The parent never started an OpenMP pool, so this worker's first forward pass starts its own
+        set_torch_threads(threads)
+        warm_up()
+        print(f"Worker {index} ready (pid {os.getpid()})", flush=True)
+        serve(listener, index)
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def run_daemon(workers=DEFAULT_WORKERS, path=None):
+    """
+    Load the models, bind the socket and keep a pool of pre-forked workers running until stopped.
+
+    Args:
+        workers: Worker processes to fork (0 serves from the daemon process itself)
+        path: Socket path (optional)
+    """
+    from .model_store import check_startup
+    from .runtime_profile import load_profile, apply_profile
+
+    path = socket_path(path)
+    if is_running(path):
+        print(f"Error: A warm pool daemon is already running on {path}")
+        return
+    if os.path.exists(path):
+        os.unlink(path)  # left over from a daemon that was killed
+
+    # Cost tables are loaded relative to the repository root
+    os.chdir(ROOT_DIR)
+    profile = load_profile()
+    # Workers pin themselves after the fork, the daemon process keeps every CPU
+    apply_profile(dict(profile, pin_workers=False))
+    if not check_startup():
+        return
+
+    # An OpenMP thread pool started before fork() can deadlock the workers, so the daemon loads the
+    # models on one thread and each worker restores the thread count after the fork
+    threads = set_torch_threads(1)
+    start = time.perf_counter()
+    preload_models()
+    print(f"Models loaded in {time.perf_counter() - start:.1f}s")
+
+    # A CUDA context does not survive fork(), so GPU hosts serve from this process
+    torch = sys.modules.get("torch")
+    if workers and torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        print("CUDA is in use, serving from the daemon process instead of forked workers")
+        workers = 0
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(64)
+    print(f"Listening on {path}")
+
+    children = {}
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        if not workers:
+            set_torch_threads(threads)
+            warm_up()
+            serve(listener, None)
+            return
+
+        for index in range(workers):
+            children[start_worker(listener, index, profile, threads)] = index
+
+        # Replace workers that die, until the daemon is stopped
+        while True:
+            pid, status = os.wait()
+            index = children.pop(pid, None)
+            if index is not None:
+                print(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+                time.sleep(1)
+                children[start_worker(listener, index, profile, threads)] = index
+    except SystemExit:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        print("Warm pool stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the models loaded in a local daemon.")
+    parser.add_argument("command", choices=["start", "status", "stop"])
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Worker processes to pre-fork (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--socket", default=None, help=f"Socket path (default: {SOCKET_PATH})")
+    args = parser.parse_args()
+
+    if args.command == "start":
+        run_daemon(args.workers, args.socket)
+        return
+
+    try:
+        reply = request({"command": "shutdown" if args.command == "stop" else "status"}, args.socket,
+                        timeout=CONNECT_TIMEOUT)
+    except WarmPoolError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command == "stop":
+        print("Warm pool stopping")
+    else:
+        print(json.dumps(reply, indent=2))
+
+
+if __name__ == "__main__":
+    main()